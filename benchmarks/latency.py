@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for VerboseDaemon without audio, keyboard or tray
+
+Drives start_recording -> audio_callback -> stop_recording -> process_job with
+synthetic PCM in place of PyAudio, a stub whisper-cli (or whisper-server) with a
+configurable delay, a stub ydotool and a headless stand-in for Gtk/AppIndicator/
+GLib. Reports p50/p95 latency and peak Python memory for every stage, sweeping
+recording length and dictionary size.
+
+Usage:
+    python3 benchmarks/latency.py
+    python3 benchmarks/latency.py --lengths 10 60 300 --dictionary-sizes 0 5000
+    python3 benchmarks/latency.py --backend server --handoff pipe --vad
+    python3 benchmarks/latency.py --backend remote
+"""
+
+import argparse
+import math
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+SAMPLE_RATE = 16000
+BLOCK_FRAMES = 1024
+
+
+# ============================================================================
+# Fake hardware and desktop modules
+# ============================================================================
+
+def install_fake_modules():
+    """Register stand-ins for pyaudio, evdev and gi before verbose is imported"""
+    pyaudio = types.ModuleType('pyaudio')
+    pyaudio.paInt16 = 8
+    pyaudio.paContinue = 0
+
+    class FakeStream:
+        """Input stream that never calls back, the benchmark feeds audio_callback itself"""
+
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+        def start_stream(self):
+            pass
+
+        def stop_stream(self):
+            pass
+
+        def close(self):
+            pass
+
+    class FakePyAudio:
+        def open(self, **kwargs):
+            return FakeStream(**kwargs)
+
+        def get_sample_size(self, fmt):
+            return 2
+
+        def get_default_input_device_info(self):
+            return {'index': 0, 'defaultSampleRate': float(SAMPLE_RATE), 'maxInputChannels': 1}
+
+        def terminate(self):
+            pass
+
+    pyaudio.PyAudio = FakePyAudio
+    pyaudio.Stream = FakeStream
+
+    evdev = types.ModuleType('evdev')
+    ecodes = types.ModuleType('evdev.ecodes')
+    ecodes.EV_SYN = 0
+    ecodes.EV_KEY = 1
+
+    key_codes = {}
+
+    def ecodes_getattr(name):
+        # Any KEY_* constant gets a stable made-up code
+        if name.startswith('KEY_'):
+            return key_codes.setdefault(name, 1000 + len(key_codes))
+        raise AttributeError(name)
+
+    ecodes.__getattr__ = ecodes_getattr
+    evdev.ecodes = ecodes
+    evdev.list_devices = lambda *args: []
+    evdev.InputDevice = None
+
+    class KeyEvent:
+        key_up, key_down, key_hold = 0, 1, 2
+
+    evdev.KeyEvent = KeyEvent
+    evdev.categorize = lambda event: event
+
+    gi = types.ModuleType('gi')
+    gi.require_version = lambda *args: None
+    repository = types.ModuleType('gi.repository')
+
+    class Anything:
+        """Absorbs any Gtk/AppIndicator call"""
+
+        def __getattr__(self, name):
+            return Anything()
+
+        def __call__(self, *args, **kwargs):
+            return Anything()
+
+    class GLib:
+        @staticmethod
+        def idle_add(func, *args):
+            # No main loop: run the callback right away
+            func(*args)
+            return 0
+
+        @staticmethod
+        def timeout_add(interval, func, *args):
+            return 0
+
+        @staticmethod
+        def source_remove(source_id):
+            return True
+
+    repository.Gtk = Anything()
+    repository.AppIndicator3 = Anything()
+    repository.GLib = GLib
+    gi.repository = repository
+
+    sys.modules.update({
+        'pyaudio': pyaudio,
+        'evdev': evdev,
+        'evdev.ecodes': ecodes,
+        'gi': gi,
+        'gi.repository': repository,
+    })
+
+
+# ============================================================================
+# Stub executables
+# ============================================================================
+
+STUB_WHISPER_CLI = '''#!{python}
+import os, sys, time
+args = sys.argv[1:]
+source = args[args.index('-f') + 1]
+if source == '-':
+    size = len(sys.stdin.buffer.read())
+else:
+    size = os.path.getsize(source)
+seconds = max(0, size - 44) / {bytes_per_second}
+time.sleep(float(os.environ.get('BENCH_WHISPER_DELAY', '0')) + seconds * float(os.environ.get('BENCH_WHISPER_RTF', '0')))
+words = open(os.environ['BENCH_VOCAB']).read().split('\\n')
+count = int(seconds * 2.5)
+text = ' '.join(words[i % len(words)] for i in range(count)) + '.'
+if source == '-':
+    print(' ' + text)
+else:
+    open(source + '.txt', 'w').write(' ' + text + '\\n')
+'''
+
+STUB_WHISPER_SERVER = '''#!{python}
+import os, sys, time, http.server
+port = int(sys.argv[sys.argv.index('--port') + 1])
+words = open(os.environ['BENCH_VOCAB']).read().split('\\n')
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        size = int(self.headers['Content-Length'])
+        self.rfile.read(size)
+        seconds = max(0, size - 400) / {bytes_per_second}
+        # Model stays loaded, so only the per-second cost applies
+        time.sleep(seconds * float(os.environ.get('BENCH_WHISPER_RTF', '0')))
+        text = (' '.join(words[i % len(words)] for i in range(int(seconds * 2.5))) + '.').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_message(self, *args):
+        pass
+
+time.sleep(float(os.environ.get('BENCH_WHISPER_DELAY', '0')))
+http.server.HTTPServer(('127.0.0.1', port), Handler).serve_forever()
+'''
+
+STUB_YDOTOOL = '''#!{python}
+import os, sys, time
+if sys.argv[1:2] == ['type']:
+    time.sleep(len(sys.argv[-1]) * float(os.environ.get('BENCH_TYPE_DELAY', '0')) / 1000.0)
+'''
+
+
+def write_executable(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content.format(python=sys.executable, bytes_per_second=SAMPLE_RATE * 2))
+    path.chmod(0o755)
+
+
+def setup_stubs(root, args):
+    """Create the stub whisper.cpp tree and ydotool, return the whisper-cli path"""
+    whisper_cli = root / 'whisper.cpp' / 'build' / 'bin' / 'whisper-cli'
+    write_executable(whisper_cli, STUB_WHISPER_CLI)
+    write_executable(whisper_cli.parent / 'whisper-server', STUB_WHISPER_SERVER)
+    models = root / 'whisper.cpp' / 'models'
+    models.mkdir(parents=True, exist_ok=True)
+    (models / 'ggml-bench.bin').write_bytes(b'')
+
+    write_executable(root / 'bin' / 'ydotool', STUB_YDOTOOL)
+    os.environ['PATH'] = str(root / 'bin') + os.pathsep + os.environ['PATH']
+    os.environ['BENCH_WHISPER_DELAY'] = str(args.whisper_delay)
+    os.environ['BENCH_WHISPER_RTF'] = str(args.whisper_rtf)
+    os.environ['BENCH_TYPE_DELAY'] = str(args.type_delay)
+    return whisper_cli
+
+
+# ============================================================================
+# Synthetic audio and configs
+# ============================================================================
+
+def synthetic_blocks(seconds, rng):
+    """PCM blocks alternating 'speech' (noisy harmonics) and short pauses"""
+    total = int(seconds * SAMPLE_RATE)
+    t = np.arange(total) / SAMPLE_RATE
+    voiced = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 1200)))
+    noise = np.array([rng.gauss(0, 0.05) for _ in range(4096)])
+    signal = voiced + np.resize(noise, total)
+    # 2.5 s of speech followed by 0.7 s of near silence
+    envelope = ((t % 3.2) < 2.5).astype(np.float64) * 0.97 + 0.03
+    pcm = (signal * envelope * 6000).astype(np.int16).tobytes()
+    step = BLOCK_FRAMES * 2
+    return [pcm[i:i + step] for i in range(0, len(pcm), step)]
+
+
+def random_word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def write_scenario(root, whisper_cli, dictionary_size, args, rng):
+    """Write the bench config and the stub's vocabulary, return the configs dir"""
+    dictionary = {}
+    while len(dictionary) < dictionary_size:
+        dictionary[random_word(rng)] = random_word(rng).title()
+    shortcuts = {'my email': 'you@example.com'}
+
+    # One word in ten of the stub's output hits a rule
+    vocabulary = [random_word(rng) for _ in range(200)]
+    keys = list(dictionary) or ['plain']
+    vocabulary += [rng.choice(keys) for _ in range(20)] + ['my email']
+    rng.shuffle(vocabulary)
+    vocab_file = root / 'vocab.txt'
+    vocab_file.write_text('\n'.join(vocabulary))
+    os.environ['BENCH_VOCAB'] = str(vocab_file)
+
+    config = {
+        'hotkey': '<f9>',
+        'whisper_model': 'bench',
+        'whisper_cpp_path': str(whisper_cli),
+        'whisper_backend': args.backend,
+        'remote_address': str(root / 'service.sock'),
+        'audio_handoff': args.handoff,
+        'insert_mode': 'type',
+        # The fake typer is handed to the daemon as its uinput sink
+        'typer': 'uinput' if args.typer == 'fake' else 'ydotool',
+        'key_delay_ms': args.type_delay if args.typer == 'fake' else 5,
+        'vad': args.vad,
+        'streaming': args.streaming,
+        'dictionary': dictionary,
+        'shortcuts': shortcuts,
+    }
+    configs_dir = root / 'configs'
+    configs_dir.mkdir(exist_ok=True)
+    (configs_dir / 'bench.yaml').write_text(yaml.safe_dump(config))
+    return configs_dir
+
+
+def start_service(verbose, root, whisper_cli):
+    """Run the shared transcription service on the stub whisper-server in a thread"""
+    configs_dir = root / 'service'
+    configs_dir.mkdir(exist_ok=True)
+    (configs_dir / 'service.yaml').write_text(yaml.safe_dump({
+        'whisper_model': 'bench',
+        'whisper_cpp_path': str(whisper_cli),
+    }))
+
+    class BenchService(verbose.TranscriptionService):
+        def load_configs(self):
+            return super().load_configs(configs_dir)
+
+    address = root / 'service.sock'
+    threading.Thread(target=BenchService().serve, args=(str(address),), daemon=True).start()
+    while not address.exists():
+        time.sleep(0.05)
+
+
+# ============================================================================
+# Stage instrumentation
+# ============================================================================
+
+class StageRecorder:
+    """Wraps methods to record wall time and peak traced memory per stage"""
+
+    def __init__(self):
+        self.times = {}
+        self.peaks = {}
+        self.trace_memory = False
+        self.local = threading.local()
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def wrap(self, owner, method_name, stage):
+        original = getattr(owner, method_name)
+        recorder = self
+
+        def timed(*args, **kwargs):
+            stack = recorder.stack()
+            frame = {'start_memory': 0, 'peak': 0}
+            if recorder.trace_memory:
+                frame['start_memory'] = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                if recorder.trace_memory:
+                    # A nested stage resets the peak, so carry its peak up to the parent
+                    peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                    if stack:
+                        stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+                    recorder.peaks[stage] = max(recorder.peaks.get(stage, 0), peak - frame['start_memory'])
+                else:
+                    recorder.times.setdefault(stage, []).append(elapsed)
+
+        setattr(owner, method_name, timed)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(math.ceil(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+
+def run_utterance(daemon, blocks, realtime):
+    """One hotkey press -> speech -> hotkey press -> text typed, returns stop-to-done seconds
+
+    Raises if the text wasn't inserted or a failure was reported, so broken runs
+    (a failed piece of a split recording) don't show up as timings.
+    """
+    done = threading.Event()
+    original_finish = daemon.finish_job
+    failures = []
+
+    def finish_and_signal(job):
+        try:
+            original_finish(job)
+        finally:
+            if job.timings.get('outcome') != 'inserted':
+                failures.append("outcome '{}'".format(job.timings.get('outcome')))
+            done.set()
+
+    def record_failure(title, message):
+        failures.append(message)
+
+    daemon.finish_job = finish_and_signal
+    daemon.notify = record_failure
+    try:
+        daemon.start_recording('bench')
+        block_seconds = BLOCK_FRAMES / SAMPLE_RATE
+        for block in blocks:
+            daemon.audio_callback(block, BLOCK_FRAMES, None, 0)
+            if realtime:
+                time.sleep(block_seconds)
+        start = time.perf_counter()
+        daemon.stop_recording()
+        done.wait()
+        elapsed = time.perf_counter() - start
+        if failures:
+            raise RuntimeError("utterance of {:.0f}s failed: {}".format(
+                len(blocks) * BLOCK_FRAMES / SAMPLE_RATE, '; '.join(failures)
+            ))
+        return elapsed
+    finally:
+        daemon.finish_job = original_finish
+        del daemon.notify
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--lengths', type=float, nargs='+', default=[5, 30, 120],
+                        help='Recording lengths in seconds (default: 5 30 120)')
+    parser.add_argument('--dictionary-sizes', type=int, nargs='+', default=[0, 100, 1000],
+                        help='Dictionary entries per scenario (default: 0 100 1000)')
+    parser.add_argument('--iterations', type=int, default=5, help='Utterances per scenario (default: 5)')
+    parser.add_argument('--whisper-delay', type=float, default=0.2,
+                        help='Stub whisper fixed delay (model load) in seconds (default: 0.2)')
+    parser.add_argument('--whisper-rtf', type=float, default=0.05,
+                        help='Stub whisper seconds per second of audio (default: 0.05)')
+    parser.add_argument('--type-delay', type=float, default=0.0,
+                        help='Stub ydotool or fake typer milliseconds per character (default: 0)')
+    parser.add_argument('--typer', choices=['ydotool', 'fake'], default='ydotool',
+                        help='Type with the stub ydotool command or in-process into a fake uinput sink')
+    parser.add_argument('--backend', choices=['cli', 'server', 'remote'], default='cli',
+                        help='remote runs verbose.py serve in-process with the stub whisper-server')
+    parser.add_argument('--handoff', choices=['file', 'pipe'], default='file')
+    parser.add_argument('--vad', action='store_true', help='Enable silence trimming')
+    parser.add_argument('--streaming', action='store_true', help='Enable streaming transcription')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Feed audio at real speed (needed to see streaming gains)')
+    args = parser.parse_args()
+
+    install_fake_modules()
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import verbose
+
+    rng = random.Random(1234)
+    root = Path(tempfile.mkdtemp(prefix='verbose_bench_'))
+    whisper_cli = setup_stubs(root, args)
+    if args.backend == 'remote':
+        start_service(verbose, root, whisper_cli)
+
+    recorder = StageRecorder()
+    recorder.wrap(verbose.CaptureBuffer, 'write', 'capture write')
+    recorder.wrap(verbose.CaptureBuffer, 'views', 'buffer views')
+    recorder.wrap(verbose.VoiceActivityDetector, 'speech_ranges', 'vad')
+    recorder.wrap(verbose.VerboseDaemon, 'write_wav', 'wav write')
+    recorder.wrap(verbose.VerboseDaemon, 'transcribe', 'transcribe')
+    recorder.wrap(verbose.VerboseDaemon, 'apply_rewrites', 'dictionary+shortcuts')
+    recorder.wrap(verbose.VerboseDaemon, 'clean_newlines', 'newline cleanup')
+    recorder.wrap(verbose.VerboseDaemon, 'insert_text', 'insertion')
+
+    stage_order = ['capture write', 'buffer views', 'vad', 'wav write', 'transcribe',
+                   'dictionary+shortcuts', 'newline cleanup', 'insertion', 'stop to done']
+
+    print("backend={} handoff={} vad={} streaming={} typer={} whisper delay={}s rtf={} iterations={}".format(
+        args.backend, args.handoff, args.vad, args.streaming, args.typer,
+        args.whisper_delay, args.whisper_rtf, args.iterations
+    ))
+    print("Stage times include nested stages (transcribe includes wav write).")
+
+    for dictionary_size in args.dictionary_sizes:
+        configs_dir = write_scenario(root, whisper_cli, dictionary_size, args, rng)
+
+        class BenchDaemon(verbose.VerboseDaemon):
+            def load_configs(self):
+                return super().load_configs(configs_dir)
+
+        daemon = BenchDaemon()
+        if args.typer == 'fake':
+            daemon.typer_sinks['uinput'] = verbose.FakeUInputSink()
+
+        for length in args.lengths:
+            blocks = synthetic_blocks(length, rng)
+            recorder.times = {}
+            recorder.peaks = {}
+            totals = []
+
+            # Warm-up (starts the stub server when that backend is used)
+            run_utterance(daemon, blocks[:50], False)
+            recorder.times = {}
+
+            for _ in range(args.iterations):
+                totals.append(run_utterance(daemon, blocks, args.realtime))
+            recorder.times['stop to done'] = totals
+
+            # One extra traced run for memory, kept out of the timings
+            recorder.trace_memory = True
+            tracemalloc.start()
+            run_utterance(daemon, blocks, False)
+            tracemalloc.stop()
+            recorder.trace_memory = False
+
+            print()
+            print("recording {:.0f}s, dictionary {} entries".format(length, dictionary_size))
+            print("  {:<22} {:>10} {:>10} {:>12}".format('stage', 'p50 ms', 'p95 ms', 'peak KiB'))
+            for stage in stage_order:
+                times = recorder.times.get(stage)
+                if not times:
+                    continue
+                # Per-call stages (capture write) are summed per utterance
+                if stage == 'capture write':
+                    per_utterance = len(times) // args.iterations
+                    times = [sum(times[i:i + per_utterance]) for i in range(0, len(times), per_utterance)]
+                peak = recorder.peaks.get(stage)
+                print("  {:<22} {:>10.2f} {:>10.2f} {:>12}".format(
+                    stage,
+                    percentile(times, 0.5) * 1000,
+                    percentile(times, 0.95) * 1000,
+                    '{:.0f}'.format(peak / 1024) if peak is not None else '-'
+                ))
+
+        for server in daemon.whisper_servers.values():
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
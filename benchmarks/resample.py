@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: cost of converting microphone audio to whisper's 16 kHz mono
+
+Feeds one minute of synthetic speech-like audio through Resampler in the
+blocks PortAudio delivers (1024 frames), for the native formats common USB
+mics and headsets use, and reports the CPU time per minute of audio, how many
+times faster than real time that is, and the peak memory of one block.
+
+Usage:
+    python3 benchmarks/resample.py
+    python3 benchmarks/resample.py --formats 48000x2 44100x1 --block-frames 512
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from verbose import Resampler
+
+OUTPUT_RATE = 16000
+DEFAULT_FORMATS = ['48000x2', '48000x1', '44100x2', '44100x1', '32000x1', '22050x1', '16000x2', '8000x1']
+REPEATS = 3
+
+
+def speech_like(rate, channels, seconds, rng):
+    """Harmonics with a syllable-rate envelope plus noise, as 16-bit PCM bytes"""
+    t = np.arange(int(rate * seconds)) / rate
+    voiced = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 1200, 3400)))
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4 * t)
+    mono = voiced * envelope * 6000 + rng.normal(0, 300, len(t))
+    return np.repeat(mono[:, None], channels, axis=1).astype(np.int16).tobytes()
+
+
+def run(rate, channels, block_frames, data):
+    """Seconds of CPU time to convert data block by block"""
+    resampler = Resampler(rate, channels, OUTPUT_RATE, 1)
+    block_bytes = block_frames * channels * 2
+    start = time.process_time()
+    for offset in range(0, len(data), block_bytes):
+        resampler.process(data[offset:offset + block_bytes])
+    return time.process_time() - start
+
+
+def block_peak(rate, channels, block_frames, data):
+    """Peak traced memory while converting one block (after warming up the stream)"""
+    resampler = Resampler(rate, channels, OUTPUT_RATE, 1)
+    block_bytes = block_frames * channels * 2
+    resampler.process(data[:block_bytes])
+    tracemalloc.start()
+    resampler.process(data[block_bytes:2 * block_bytes])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--formats', nargs='+', default=DEFAULT_FORMATS, metavar='RATExCHANNELS',
+                        help='Native formats to convert from (default: {})'.format(' '.join(DEFAULT_FORMATS)))
+    parser.add_argument('--block-frames', type=int, default=1024,
+                        help='Frames per PortAudio callback (default: 1024)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1234)
+    print("One minute of audio to {} Hz mono in {}-frame blocks, best of {}".format(
+        OUTPUT_RATE, args.block_frames, REPEATS
+    ))
+    print("{:>14}  {:>12}  {:>14}  {:>14}".format('format', 'ms / minute', 'x real time', 'KiB per block'))
+    for name in args.formats:
+        rate, channels = (int(part) for part in name.split('x'))
+        data = speech_like(rate, channels, 60, rng)
+        seconds = min(run(rate, channels, args.block_frames, data) for _ in range(REPEATS))
+        peak = block_peak(rate, channels, args.block_frames, data)
+        print("{:>14}  {:>12.1f}  {:>14.0f}  {:>14.1f}".format(
+            '{} Hz x{}'.format(rate, channels), seconds * 1000, 60 / seconds if seconds else float('inf'), peak / 1024
+        ))
+
+
+if __name__ == '__main__':
+    main()
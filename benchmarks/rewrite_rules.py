@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: dictionary/shortcut rewriting cost as the number of rules grows
+
+Compares the compiled single-pass RewriteRules engine with the previous
+approach (one re.compile + full pass per dictionary entry, three str.replace
+passes per shortcut) for 10 to 10,000 rules.
+
+Usage: python3 benchmarks/rewrite_rules.py
+"""
+
+import random
+import re
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from verbose import RewriteRules
+
+RULE_COUNTS = [10, 100, 1000, 10000]
+TEXT_WORDS = 300
+REPEATS = 5
+
+
+def random_word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+
+def make_rules(count, rng):
+    """Half dictionary entries, half shortcuts, some of them multi-word phrases"""
+    dictionary = {}
+    shortcuts = {}
+    while len(dictionary) + len(shortcuts) < count:
+        words = ' '.join(random_word(rng) for _ in range(rng.randint(1, 3)))
+        if len(dictionary) <= len(shortcuts):
+            dictionary[words] = words.title()
+        else:
+            shortcuts[words] = '<' + words.upper() + '>'
+    return dictionary, shortcuts
+
+
+def make_text(dictionary, shortcuts, rng):
+    """A transcript where about one word in ten triggers a rule"""
+    phrases = list(dictionary) + list(shortcuts)
+    words = []
+    while len(words) < TEXT_WORDS:
+        if rng.random() < 0.1:
+            words.extend(rng.choice(phrases).split())
+        else:
+            words.append(random_word(rng))
+    return ' '.join(words)
+
+
+def legacy_rewrite(text, dictionary, shortcuts):
+    """The per-entry implementation RewriteRules replaced"""
+    for wrong, correct in dictionary.items():
+        pattern = re.compile(r'\b' + re.escape(wrong) + r'\b', re.IGNORECASE)
+        text = pattern.sub(correct, text)
+    for phrase, replacement in shortcuts.items():
+        text = text.replace(phrase, replacement)
+        text = text.replace(phrase.lower(), replacement)
+        text = text.replace(phrase.capitalize(), replacement)
+    return text
+
+
+def best_of(func, repeats=REPEATS):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(42)
+    print("{} word transcript, best of {} runs".format(TEXT_WORDS, REPEATS))
+    print("{:>7}  {:>12}  {:>14}  {:>14}  {:>8}".format(
+        'rules', 'compile ms', 'compiled ms', 'legacy ms', 'speedup'
+    ))
+
+    for count in RULE_COUNTS:
+        dictionary, shortcuts = make_rules(count, rng)
+        text = make_text(dictionary, shortcuts, rng)
+
+        start = time.perf_counter()
+        rules = RewriteRules(dictionary, shortcuts)
+        compile_time = time.perf_counter() - start
+
+        compiled = best_of(lambda: rules.apply(text))
+        # re's internal cache only holds a few hundred patterns, so large
+        # dictionaries pay the full compile on every utterance like in production
+        legacy = best_of(lambda: legacy_rewrite(text, dictionary, shortcuts), repeats=1 if count >= 10000 else REPEATS)
+
+        print("{:>7}  {:>12.2f}  {:>14.3f}  {:>14.3f}  {:>7.0f}x".format(
+            count, compile_time * 1000, compiled * 1000, legacy * 1000, legacy / compiled
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,189 +3,3006 @@
 Verbose - Simple voice-to-text daemon for Linux
 """
 
+import time
+STARTED = time.monotonic()  # Start of the startup time report, taken before any other import
+
 import os
+import re
 import sys
+import json
+import argparse
+import collections
+import collections.abc
+import concurrent.futures
+import ctypes
+import getpass
+import hashlib
+import pwd
 import yaml
 import wave
 import tempfile
 import subprocess
 import threading
 import signal
+import socket
+import uuid
+import http.client
+import math
+import mmap
+import queue
+import resource
+import select
+import selectors
+import struct
+import types
 from pathlib import Path
 
-import pyaudio
-import evdev
-from evdev import ecodes
-import gi
-gi.require_version('Gtk', '3.0')
-gi.require_version('AppIndicator3', '0.1')
-from gi.repository import Gtk, AppIndicator3, GLib
+# numpy, audio, keyboard and tray modules are only imported when they're first needed,
+# so startup stays fast, batch mode works without them and --headless without GTK
+np = None
+pyaudio = None
+evdev = None
+ecodes = None
+Gtk = AppIndicator3 = GLib = None
 
 
-class VerboseDaemon:
-    """Main daemon for voice-to-text recording and transcription"""
+def import_numpy():
+    """Import numpy on first use (about 100 ms); cheap to call again, so audio callbacks can too"""
+    global np
+    if np is None:
+        import numpy as np
+
+
+def import_audio_module():
+    global pyaudio
+    import pyaudio
+
+
+def import_input_modules():
+    global evdev, ecodes
+    import evdev
+    from evdev import ecodes
+
+
+def import_tray_modules():
+    global Gtk, AppIndicator3, GLib
+    import gi
+    gi.require_version('Gtk', '3.0')
+    gi.require_version('AppIndicator3', '0.1')
+    from gi.repository import Gtk, AppIndicator3, GLib
+
+
+class quiet_stderr:
+    """Silence output written straight to file descriptor 2 (ALSA and JACK probing)"""
+
+    def __enter__(self):
+        sys.stderr.flush()
+        self.saved = os.dup(2)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 2)
+        os.close(devnull)
+
+    def __exit__(self, *exc):
+        os.dup2(self.saved, 2)
+        os.close(self.saved)
+
+
+class RollingHistogram:
+    """Cumulative Prometheus-style buckets plus the most recent values for quantiles"""
+
+    def __init__(self, buckets, window=200):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = collections.deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+
+    def quantile(self, fraction):
+        """Quantile over the rolling window"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    """Per-stage utterance timings, rendered in the Prometheus text format"""
+
+    SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5)
+    QUANTILES = (0.5, 0.95)
 
     def __init__(self):
-        self.configs = self.load_configs()  # Dict of config_name -> config_data
-        self.is_recording = False
-        self.is_processing = False
-        self.is_cancelled = False
-        self.active_config_name = None  # Track which config triggered recording
-        self.audio_frames = []
-        self.audio = pyaudio.PyAudio()
-        self.stream = None
-        self.typing_process = None  # Track ydotool process for cancellation
+        self.lock = threading.Lock()
+        self.stages = {}  # stage -> RollingHistogram of seconds
+        self.realtime_factors = {}  # model -> RollingHistogram of whisper seconds per audio second
+        self.outcomes = collections.Counter()
+        self.gauges = {}  # name -> (help, value)
+
+    def set_gauge(self, name, value, help_text):
+        with self.lock:
+            self.gauges[name] = (help_text, value)
+
+    def observe_stage(self, stage, seconds):
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = RollingHistogram(self.SECONDS_BUCKETS)
+            self.stages[stage].observe(seconds)
+
+    def observe_realtime_factor(self, model, factor):
+        with self.lock:
+            if model not in self.realtime_factors:
+                self.realtime_factors[model] = RollingHistogram(self.RATIO_BUCKETS)
+            self.realtime_factors[model].observe(factor)
+
+    def count_utterance(self, outcome):
+        with self.lock:
+            self.outcomes[outcome] += 1
+
+    def render_histogram(self, lines, name, label, series):
+        """Append histogram and rolling-quantile lines for one metric"""
+        lines.append('# TYPE {} histogram'.format(name))
+        for key, histogram in sorted(series.items()):
+            labels = '{}="{}"'.format(label, key)
+            for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+            lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, histogram.count))
+            lines.append('{}_sum{{{}}} {:.6f}'.format(name, labels, histogram.total))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+
+        lines.append('# TYPE {}_recent gauge'.format(name))
+        for key, histogram in sorted(series.items()):
+            for fraction in self.QUANTILES:
+                lines.append('{}_recent{{{}="{}",quantile="{}"}} {:.6f}'.format(
+                    name, label, key, fraction, histogram.quantile(fraction)
+                ))
 
-        # Icon paths (relative to script directory)
-        script_dir = Path(__file__).parent
-        self.icon_dir = str(script_dir / "icons")
-        self.ICON_IDLE = str(script_dir / "icons" / "idle")
-        self.ICON_RECORDING = str(script_dir / "icons" / "recording")
-        self.ICON_PROCESSING = str(script_dir / "icons" / "processing")
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            lines = ['# HELP verbose_stage_seconds Time spent in each stage of an utterance']
+            self.render_histogram(lines, 'verbose_stage_seconds', 'stage', self.stages)
+            lines.append('# HELP verbose_whisper_realtime_factor Whisper wall time per second of audio')
+            self.render_histogram(lines, 'verbose_whisper_realtime_factor', 'model', self.realtime_factors)
+            lines.append('# HELP verbose_utterances_total Utterances by outcome')
+            lines.append('# TYPE verbose_utterances_total counter')
+            for outcome, count in sorted(self.outcomes.items()):
+                lines.append('verbose_utterances_total{{outcome="{}"}} {}'.format(outcome, count))
+            for name, (help_text, value) in sorted(self.gauges.items()):
+                lines.append('# HELP {} {}'.format(name, help_text))
+                lines.append('# TYPE {} gauge'.format(name))
+                lines.append('{} {}'.format(name, value))
+            return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Atomically write the metrics for node_exporter's textfile collector"""
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def serve(self, path):
+        """Answer every connection on a Unix socket with the current metrics (runs forever)"""
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        os.chmod(path, 0o600)
+        server.listen(4)
+        while True:
+            conn, _ = server.accept()
+            try:
+                conn.sendall(self.render().encode('utf-8'))
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+
+class ModelSpeeds:
+    """Real-time factor of each whisper model on this machine, learned from past utterances
+
+    Keeps an exponentially weighted average of whisper seconds per second of audio
+    for every model and saves it so the next start doesn't have to learn again.
+    Models that haven't run yet are estimated from their size.
+    """
+
+    # Rough CPU real-time factors by model size, only used until a model has been measured
+    PRIOR_REALTIME_FACTORS = {
+        'tiny': 0.05, 'base': 0.1, 'small': 0.3, 'medium': 0.8, 'large': 1.6,
+    }
+    SMOOTHING = 0.3  # Weight of the newest measurement
+
+    def __init__(self, path=None):
+        cache_dir = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+        self.path = Path(path) if path else cache_dir / 'verbose' / 'model_speeds.json'
+        self.lock = threading.Lock()
+        self.factors = {}  # model -> {'realtime_factor': float, 'samples': int}
+        self.calibrated = {}  # model -> real-time factor measured by --calibrate
+        try:
+            with open(self.path) as f:
+                self.factors = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def prior(self, model):
+        """Guess for a model that was never measured ('small.en-q5_1' counts as 'small')"""
+        if model in self.calibrated:
+            return self.calibrated[model]
+        size = re.split(r'[.\-_]', model, maxsplit=1)[0]
+        return self.PRIOR_REALTIME_FACTORS.get(size, 1.0)
+
+    def realtime_factor(self, model):
+        entry = self.factors.get(model)
+        if entry:
+            return entry['realtime_factor']
+        return self.prior(model)
+
+    def estimate(self, model, audio_seconds):
+        """Expected whisper seconds for this much audio"""
+        return self.realtime_factor(model) * audio_seconds
+
+    def observe(self, model, audio_seconds, whisper_seconds):
+        if audio_seconds <= 0:
+            return
+        factor = whisper_seconds / audio_seconds
+        with self.lock:
+            entry = self.factors.get(model)
+            if entry:
+                factor = self.SMOOTHING * factor + (1 - self.SMOOTHING) * entry['realtime_factor']
+                samples = entry['samples'] + 1
+            else:
+                samples = 1
+            self.factors[model] = {'realtime_factor': round(factor, 4), 'samples': samples}
+            self.save()
 
-        # System tray indicator - use icon theme path
-        self.indicator = AppIndicator3.Indicator.new(
-            "verbose",
-            "idle",  # Just the name, not full path
-            AppIndicator3.IndicatorCategory.APPLICATION_STATUS
-        )
-        self.indicator.set_icon_theme_path(self.icon_dir)
-        self.indicator.set_status(AppIndicator3.IndicatorStatus.ACTIVE)
-        self.indicator.set_menu(self.build_menu())
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(temp_path, 'w') as f:
+                json.dump(self.factors, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print("Could not save model speeds: " + str(e))
+
+    def choose(self, candidates, audio_seconds, budget):
+        """Most accurate candidate expected to finish within budget, with every estimate
+
+        Candidates are ordered from fastest to most accurate. When none fits, the one
+        expected to finish first is used.
+        """
+        estimates = [(model, self.estimate(model, audio_seconds)) for model in candidates]
+        within = [model for model, seconds in estimates if seconds <= budget]
+        if within:
+            return within[-1], estimates
+        return min(estimates, key=lambda estimate: estimate[1])[0], estimates
+
+
+def find_free_port():
+    """Ask the kernel for an unused localhost TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_address(address):
+    """Socket family and address for 'host:port' (TCP) or a Unix socket path"""
+    if '/' not in address and ':' in address:
+        host, port = address.rsplit(':', 1)
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    return socket.AF_UNIX, address
+
+
+def pcm_levels(data):
+    """RMS and peak level of a block of 16-bit PCM audio"""
+    import_numpy()
+    samples = np.frombuffer(data, dtype=np.int16)
+    if not samples.size:
+        return 0.0, 0
+    return pcm_rms(data), max(int(samples.max()), -int(samples.min()))
+
+
+def pcm_rms(data):
+    """Root-mean-square level of a block of 16-bit PCM audio"""
+    import_numpy()
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    if not samples.size:
+        return 0.0
+    return float(np.sqrt(np.dot(samples, samples) / samples.size))
+
+
+def wav_header(data_size, sample_rate, channels, sample_width=2):
+    """Build a 44-byte PCM WAV header for data_size bytes of audio"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b'data', data_size
+    )
+
+
+def write_pipe(fd, chunks):
+    """Write buffers to a pipe file descriptor without joining them, then close it"""
+    try:
+        for chunk in chunks:
+            view = memoryview(chunk)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+    except OSError:
+        pass  # The reader exited early, its exit status reports the problem
+    finally:
+        os.close(fd)
+
+
+def slice_views(views, start, end):
+    """The parts of a list of buffers between two byte offsets, without copying"""
+    parts = []
+    offset = 0
+    for view in views:
+        view_end = offset + len(view)
+        if view_end > start and offset < end:
+            parts.append(view[max(start - offset, 0):min(end, view_end) - offset])
+        offset = view_end
+        if offset >= end:
+            break
+    return parts
+
+
+class VoiceActivityDetector:
+    """Energy-based speech detection that decides which parts of a recording go to whisper"""
+
+    FRAME_SECONDS = 0.03
+    SPLIT_SMOOTHING = 10  # Frames averaged when looking for the quietest place to split
+
+    def __init__(self, config):
+        import_numpy()
+        self.threshold = config.get('silence_threshold', 500)
+        self.frame_samples = max(1, int(config['sample_rate'] * self.FRAME_SECONDS)) * config['channels']
+        self.frame_bytes = self.frame_samples * 2
+        self.padding_frames = int(math.ceil(config.get('vad_padding', 0.25) / self.FRAME_SECONDS))
+        self.max_pause_frames = int(math.ceil(config.get('vad_max_pause', 1.0) / self.FRAME_SECONDS))
+
+    def frame_levels(self, views):
+        """RMS level of every frame, computed a buffer at a time without joining the views"""
+        levels = []
+        pending = np.empty(0, dtype=np.int16)
+
+        for view in views:
+            samples = np.frombuffer(view, dtype=np.int16)
+
+            # Complete the frame left over from the previous buffer
+            if pending.size:
+                take = self.frame_samples - pending.size
+                pending = np.concatenate((pending, samples[:take]))
+                samples = samples[take:]
+                if pending.size < self.frame_samples:
+                    continue
+                levels.append(self.rms(pending.reshape(1, -1)))
+                pending = np.empty(0, dtype=np.int16)
+
+            usable = samples.size - samples.size % self.frame_samples
+            if usable:
+                levels.append(self.rms(samples[:usable].reshape(-1, self.frame_samples)))
+            pending = samples[usable:].copy()
+
+        if pending.size:
+            levels.append(self.rms(pending.reshape(1, -1)))
+
+        if not levels:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(levels)
+
+    def rms(self, frames):
+        """Per-row RMS of a 2D array of samples"""
+        frames = frames.astype(np.float32)
+        return np.sqrt(np.einsum('ij,ij->i', frames, frames) / frames.shape[1])
+
+    def speech_ranges(self, views):
+        """Byte ranges to keep: speech plus padding, with long pauses cut down
+
+        Leading and trailing silence is dropped, pauses shorter than max_pause are
+        kept as they are, longer ones shrink to the padding on either side of them.
+        Returns an empty list when nothing reaches the threshold.
+        """
+        levels = self.frame_levels(views)
+        speech = levels >= self.threshold
+        if not speech.any():
+            return []
+
+        # Grow every speech frame by the padding on both sides
+        if self.padding_frames:
+            window = np.ones(2 * self.padding_frames + 1, dtype=np.int32)
+            speech = np.convolve(speech.astype(np.int32), window, mode='same') > 0
+
+        edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        # Keep short pauses, split at long ones
+        gaps = starts[1:] - ends[:-1]
+        split = np.flatnonzero(gaps >= self.max_pause_frames)
+        starts = np.concatenate((starts[:1], starts[split + 1]))
+        ends = np.concatenate((ends[split], ends[-1:]))
+
+        total = sum(len(view) for view in views)
+        return [
+            (int(start) * self.frame_bytes, min(int(end) * self.frame_bytes, total))
+            for start, end in zip(starts, ends)
+        ]
+
+    def split_points(self, views, max_seconds):
+        """Byte offsets that cut a recording into pieces no longer than max_seconds
+
+        Each cut goes into the quietest stretch of the second half of the allowed
+        length, which is a pause between words whenever there is one.
+        """
+        levels = self.frame_levels(views)
+        max_frames = max(2, int(max_seconds / self.FRAME_SECONDS))
+        smoothing = min(self.SPLIT_SMOOTHING, max_frames // 2) or 1
+        smoothed = np.convolve(levels, np.ones(smoothing) / smoothing, mode='same')
+
+        cuts = []
+        position = 0
+        while len(levels) - position > max_frames:
+            search_start = position + max_frames // 2
+            position = search_start + int(np.argmin(smoothed[search_start:position + max_frames]))
+            cuts.append(position * self.frame_bytes)
+        return cuts
+
+
+class RewriteRules:
+    """Dictionary corrections and shortcut expansions compiled into a single regex
+
+    All phrases go into one trie-shaped pattern that is matched case-insensitively
+    in a single left-to-right pass. Precedence: the earliest match wins, at the same
+    position the longest phrase wins, and a dictionary entry beats a shortcut for the
+    same phrase. Dictionary entries only match whole words, shortcuts match anywhere.
+    Replacements are inserted literally and are never rewritten again.
+    """
+
+    WORD_CHAR = re.compile(r'\w')
+
+    def __init__(self, dictionary=None, shortcuts=None):
+        # Rules are looked up by casefold(), which puts together what IGNORECASE
+        # matches (µ/μ, ſ/s); the pattern is built from the phrases as written
+        self.dictionary = {}
+        self.shortcuts = {}
+        spellings = {}  # Lowercase phrase -> casefolded key
+        for wrong, correct in (dictionary or {}).items():
+            if str(wrong):
+                self.dictionary[str(wrong).casefold()] = str(correct)
+                spellings[str(wrong).lower()] = str(wrong).casefold()
+        for phrase, replacement in (shortcuts or {}).items():
+            if str(phrase):
+                self.shortcuts[str(phrase).casefold()] = str(replacement)
+                spellings[str(phrase).lower()] = str(phrase).casefold()
+
+        self.pattern = None
+        if spellings:
+            trie = {}
+            for spelling, phrase in spellings.items():
+                node = trie
+                for char in spelling:
+                    node = node.setdefault(char, {})
+                node[''] = phrase
+            # Group 'start' records whether the match began at a word boundary
+            self.pattern = re.compile(r'(?P<start>\b)?' + self.trie_regex(trie), re.IGNORECASE)
+
+    def __len__(self):
+        return len(self.dictionary) + len(self.shortcuts)
+
+    def trie_regex(self, node):
+        """Turn a character trie into a regex that prefers longer phrases"""
+        alternatives = [
+            re.escape(char) + self.trie_regex(child)
+            for char, child in sorted(node.items()) if char != ''
+        ]
+
+        # Ending here comes after the longer continuations, so they are tried first
+        phrase = node.get('')
+        if phrase is not None:
+            if phrase in self.dictionary:
+                # Whole words only: needs a boundary where the match started and here
+                alternatives.append(r'(?(start)\b|(?!))')
+            if phrase in self.shortcuts:
+                alternatives.append('')
+
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return '(?:' + '|'.join(alternatives) + ')'
+
+    def is_boundary(self, text, index):
+        """Same test as regex \\b: a word character on exactly one side of index"""
+        before = index > 0 and self.WORD_CHAR.match(text, index - 1) is not None
+        after = index < len(text) and self.WORD_CHAR.match(text, index) is not None
+        return before != after
+
+    def replace(self, match):
+        """Replacement for one match of the combined pattern"""
+        # The few matches casefold() doesn't map to a rule (dotless i) are left as they are
+        phrase = match.group(0).casefold()
+        if phrase in self.dictionary:
+            if match.group('start') is not None and self.is_boundary(match.string, match.end()):
+                return self.dictionary[phrase]
+        return self.shortcuts.get(phrase, match.group(0))
+
+    def apply(self, text):
+        """Rewrite text with every rule in one pass"""
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self.replace, text)
+
+
+# Where 'verbose.py serve' listens and whisper_backend: remote connects by default. The
+# directory must not be writable by other users, or anyone could listen there first
+DEFAULT_SERVICE_ADDRESS = '/run/verbose/transcribe.sock'
+
+# Default config values, each config file overrides some of them
+DEFAULT_CONFIG = {
+    'hotkey': '<f9>',
+    'whisper_model': 'base',
+    'whisper_cpp_path': './whisper.cpp/build/bin/whisper-cli',
+    'sample_rate': 16000,
+    'channels': 1,
+    'avoid_newlines': False,
+    'whisper_timeout': 300,  # 5 minutes for long recordings
+    'latency_budget': None,  # Seconds whisper may take, picks from candidate_models when set
+    'candidate_models': [],  # Models to pick from, fastest (least accurate) first
+    'whisper_backend': 'cli',  # 'cli' (one process per utterance), 'server' (keep model loaded) or 'remote'
+    'remote_address': None,  # Socket path or host:port of 'verbose.py serve' (default: DEFAULT_SERVICE_ADDRESS)
+    'remote_user': None,  # User the service runs as (name or UID), besides root and yourself
+    'whisper_server_path': None,  # Defaults to whisper-server next to whisper_cpp_path
+    'whisper_server_startup_timeout': 60,
+    'audio_handoff': 'file',  # 'file' (temporary WAV) or 'pipe' (stdin/stdout, nothing on disk)
+    'whisper_threads': None,  # whisper.cpp -t, defaults to the calibrated value (verbose.py --calibrate)
+    'whisper_processors': None,  # whisper.cpp -p, defaults to the calibrated value
+    'debug_keep_temp_files': False,  # Keep temp files on failure for debugging
+    'capture_memory_limit_mb': 64,  # Recording memory cap, longer recordings spill to disk
+    'capture_prealloc_seconds': 60,  # Capture buffer allocated up front when recording starts
+    'capture_spill_dir': None,  # Directory for the spill file (default: system temp dir)
+    'native_capture': True,  # Record in the microphone's own format and convert to sample_rate/channels
+    'always_listening': False,  # Keep the microphone open so recordings start instantly
+    'preroll_ms': 500,  # With always_listening, audio from before the key press that's included
+    'vad': False,  # Trim silence before transcription, skip whisper if there's no speech
+    'vad_padding': 0.25,  # Seconds of audio kept around detected speech
+    'vad_max_pause': 1.0,  # Pauses longer than this (seconds) are shortened
+    'parallel_split_seconds': 120,  # Recordings longer than this are split and transcribed in parallel (0: off)
+    'parallel_segment_seconds': 60,  # Longest piece a split recording is cut into
+    'segment_retries': 1,  # Extra attempts for a piece that fails
+    'streaming': False,  # Transcribe finished segments while still recording
+    'silence_threshold': 500,  # RMS level (16-bit) below which audio counts as silence
+    'stream_pause_duration': 0.6,  # Seconds of silence that end a streaming segment
+    'stream_min_segment': 5,  # Don't cut segments shorter than this (seconds)
+    'stream_max_segment': 30,  # Cut segments at this length even without a pause
+    'auto_stop_silence': 0,  # Stop recording after this many seconds of silence (0: off)
+    'max_recording_seconds': 0,  # Stop recording at this length (0: no limit)
+    'insert_mode': 'type',  # 'type', 'paste' (via clipboard) or 'auto'
+    'paste_threshold': 200,  # With insert_mode auto, paste text at least this long
+    'paste_keys': 'ctrl+v',  # Chord sent to paste (terminals usually need ctrl+shift+v)
+    'paste_restore_delay': 0.3,  # Seconds to wait before restoring the previous clipboard
+    'typer': 'auto',  # 'uinput', 'ydotoold', 'ydotool' (a command per utterance) or 'auto'
+    'key_delay_ms': 5,  # Delay between typed keys, 0 sends each chunk at once
+    'adaptive_key_delay': False,  # Raise the delay when the system falls behind, lower it when it keeps up
+    'dictionary': {},
+    'shortcuts': {}
+}
+
+
+class CompiledConfig(collections.abc.Mapping):
+    """A config file merged with the defaults, validated and resolved once
+
+    Reads like the settings dict (config['sample_rate'], config.get(...)) and adds the
+    resolved binary and model paths, the parsed hotkey and the compiled rewrite rules.
+    It's never modified: reloading a file builds a new object, so recordings already
+    in progress keep the settings they started with.
+    """
+
+    CHOICES = {
+        'whisper_backend': ('cli', 'server', 'remote'),
+        'audio_handoff': ('file', 'pipe'),
+        'insert_mode': ('type', 'paste', 'auto'),
+        'typer': ('auto', 'uinput', 'ydotoold', 'ydotool'),
+    }
+
+    def __init__(self, name, settings, hotkey_code, source=None, digest=None):
+        settings = dict(settings)
+        settings['dictionary'] = settings.get('dictionary') or {}
+        settings['shortcuts'] = settings.get('shortcuts') or {}
+        self.validate(settings)
+
+        self.name = name
+        self.source = source  # YAML file it came from, None for the built-in defaults
+        self.digest = digest  # Hash of the file contents, rewrites that change nothing are ignored
+        self.hotkey_code = hotkey_code
+
+        # Compile the rewrite rules once instead of on every utterance
+        self.rewrite_rules = RewriteRules(settings['dictionary'], settings['shortcuts'])
+        settings['rewrite_rules'] = self.rewrite_rules
+
+        # Relative paths are relative to this script's location
+        script_dir = Path(__file__).parent.resolve()
+        self.whisper_path = self.resolve_path(settings['whisper_cpp_path'], script_dir)
 
-        # Find keyboard device for evdev
-        self.keyboard_device = self.find_keyboard()
+        # Models live in the whisper.cpp root (build/bin/whisper-cli -> build/bin -> build -> whisper.cpp)
+        self.model_dir = self.whisper_path.parent.parent.parent / 'models'
+        self.model_file = self.model_path(settings['whisper_model'])
 
-        # Build hotkey map: hotkey_code -> config_name
-        self.hotkey_map = {}
-        for config_name, config_data in self.configs.items():
-            hotkey_code = self.parse_hotkey(config_data['hotkey'])
-            if hotkey_code in self.hotkey_map:
-                # Duplicate hotkey detected
-                self.show_notification(
-                    "Verbose Configuration Error",
-                    "Duplicate hotkey '{}' in configs '{}' and '{}'. Skipping '{}'.".format(
-                        config_data['hotkey'],
-                        self.hotkey_map[hotkey_code],
-                        config_name,
-                        config_name
-                    )
+        if settings.get('whisper_server_path'):
+            self.server_path = self.resolve_path(settings['whisper_server_path'], script_dir)
+        else:
+            # whisper.cpp builds whisper-server next to whisper-cli
+            self.server_path = self.whisper_path.parent / 'whisper-server'
+
+        # Users whose transcription service gets to type into this session
+        self.service_uids = {0, os.getuid()}
+        if isinstance(settings['remote_user'], str):
+            self.service_uids.add(pwd.getpwnam(settings['remote_user']).pw_uid)
+        elif settings['remote_user'] is not None:
+            self.service_uids.add(settings['remote_user'])
+
+        self.settings = types.MappingProxyType(settings)
+        self.models_found = set()
+
+    @staticmethod
+    def resolve_path(path, script_dir):
+        path = Path(path).expanduser()
+        if not path.is_absolute():
+            path = (script_dir / path).resolve()
+        return path
+
+    @classmethod
+    def validate(cls, settings):
+        """Reject settings that would only fail once recording starts"""
+        sample_rate = settings['sample_rate']
+        if not isinstance(sample_rate, int) or isinstance(sample_rate, bool) or sample_rate <= 0:
+            raise ValueError("sample_rate must be a positive integer, got {!r}".format(sample_rate))
+        if settings['channels'] not in (1, 2) or isinstance(settings['channels'], bool):
+            raise ValueError("channels must be 1 or 2, got {!r}".format(settings['channels']))
+        for key, choices in cls.CHOICES.items():
+            if settings[key] not in choices:
+                raise ValueError("{} must be one of {}, got {!r}".format(key, ', '.join(choices), settings[key]))
+        for key in ('dictionary', 'shortcuts'):
+            if not isinstance(settings[key], dict):
+                raise ValueError("{} must be a mapping".format(key))
+        budget = settings['latency_budget']
+        if budget is not None and (not isinstance(budget, (int, float)) or isinstance(budget, bool) or budget <= 0):
+            raise ValueError("latency_budget must be a positive number of seconds, got {!r}".format(budget))
+        for key in ('parallel_split_seconds', 'parallel_segment_seconds'):
+            seconds = settings[key]
+            if not isinstance(seconds, (int, float)) or isinstance(seconds, bool) or seconds < 0:
+                raise ValueError("{} must be a number of seconds, got {!r}".format(key, seconds))
+        if not settings['parallel_segment_seconds']:
+            raise ValueError("parallel_segment_seconds must be more than 0")
+        for key in ('whisper_threads', 'whisper_processors'):
+            count = settings[key]
+            if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count <= 0):
+                raise ValueError("{} must be a positive integer, got {!r}".format(key, count))
+        preroll = settings['preroll_ms']
+        if not isinstance(preroll, (int, float)) or isinstance(preroll, bool) or not 0 <= preroll <= 5000:
+            raise ValueError("preroll_ms must be between 0 and 5000, got {!r}".format(preroll))
+        for key in ('auto_stop_silence', 'max_recording_seconds'):
+            seconds = settings[key]
+            if not isinstance(seconds, (int, float)) or isinstance(seconds, bool) or seconds < 0:
+                raise ValueError("{} must be a number of seconds, got {!r}".format(key, seconds))
+        delay = settings['key_delay_ms']
+        if not isinstance(delay, (int, float)) or isinstance(delay, bool) or not 0 <= delay <= 100:
+            raise ValueError("key_delay_ms must be between 0 and 100, got {!r}".format(delay))
+        address = settings['remote_address']
+        if address is not None and not isinstance(address, str):
+            raise ValueError("remote_address must be a socket path or host:port, got {!r}".format(address))
+        user = settings['remote_user']
+        if isinstance(user, str):
+            try:
+                pwd.getpwnam(user)
+            except KeyError:
+                raise ValueError("remote_user '{}' doesn't exist".format(user))
+        elif user is not None and (not isinstance(user, int) or isinstance(user, bool) or user < 0):
+            raise ValueError("remote_user must be a user name or UID, got {!r}".format(user))
+        candidates = settings['candidate_models']
+        if not isinstance(candidates, list) or not all(isinstance(model, str) for model in candidates):
+            raise ValueError("candidate_models must be a list of model names")
+
+    def model_path(self, model):
+        """Path of a ggml model file in this config's whisper.cpp models directory"""
+        return self.model_dir / ('ggml-' + model + '.bin')
+
+    def has_model(self, model=None):
+        """Whether a model file exists (looked up until it's there, then remembered)"""
+        model = model or self.settings['whisper_model']
+        if model not in self.models_found and self.model_path(model).exists():
+            self.models_found.add(model)
+        return model in self.models_found
+
+    def __getitem__(self, key):
+        return self.settings[key]
+
+    def __iter__(self):
+        return iter(self.settings)
+
+    def __len__(self):
+        return len(self.settings)
+
+    def __repr__(self):
+        return "CompiledConfig({!r}, source={})".format(self.name, self.source)
+
+
+class CaptureBuffer:
+    """Append-only PCM store written in place from the audio callback
+
+    Audio lives in fixed-size chunks that are never moved or resized, so the
+    memoryviews handed to readers stay valid while recording continues. Chunks
+    are preallocated bytearrays until memory_limit bytes are in use, after that
+    new chunks are memory-mapped from an (already unlinked) temporary file.
+    """
+
+    CHUNK_SIZE = 1 << 20  # 1 MiB, a multiple of mmap.ALLOCATIONGRANULARITY
+
+    def __init__(self, memory_limit, prealloc=0, spill_dir=None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.chunks = []
+        self.memory_chunks = 0
+        self.spill_file = None
+        self.spill_chunks = 0
+        self.length = 0
+
+        prealloc = min(prealloc, memory_limit)
+        while len(self.chunks) * self.CHUNK_SIZE < prealloc:
+            self.chunks.append(self.new_chunk())
+
+    def __len__(self):
+        return self.length
+
+    def new_chunk(self):
+        """Allocate the next chunk, in memory or from the spill file once over the limit"""
+        if (self.memory_chunks + 1) * self.CHUNK_SIZE <= self.memory_limit:
+            self.memory_chunks += 1
+            return bytearray(self.CHUNK_SIZE)
+
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+            print("Recording exceeds {} MB, spilling audio to disk".format(self.memory_limit // (1 << 20)))
+
+        offset = self.spill_chunks * self.CHUNK_SIZE
+        self.spill_file.truncate(offset + self.CHUNK_SIZE)
+        self.spill_chunks += 1
+        return mmap.mmap(self.spill_file.fileno(), self.CHUNK_SIZE, offset=offset)
+
+    def write(self, data):
+        """Append a block of PCM audio, copying it straight into place"""
+        view = memoryview(data).cast('B')
+        while view:
+            index, offset = divmod(self.length, self.CHUNK_SIZE)
+            if index == len(self.chunks):
+                self.chunks.append(self.new_chunk())
+            count = min(len(view), self.CHUNK_SIZE - offset)
+            self.chunks[index][offset:offset + count] = view[:count]
+            self.length += count
+            view = view[count:]
+
+    def views(self, start=0, end=None):
+        """Zero-copy memoryviews covering bytes start..end of the recording"""
+        end = self.length if end is None else min(end, self.length)
+        views = []
+        position = start
+        while position < end:
+            index, offset = divmod(position, self.CHUNK_SIZE)
+            count = min(end - position, self.CHUNK_SIZE - offset)
+            views.append(memoryview(self.chunks[index])[offset:offset + count])
+            position += count
+        return views
+
+    def close(self):
+        """Release the memory and the spill file"""
+        for chunk in self.chunks:
+            if isinstance(chunk, mmap.mmap):
+                try:
+                    chunk.close()
+                except BufferError:
+                    pass  # A reader still holds a view, it is unmapped once that is gone
+        self.chunks = []
+        self.length = 0
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+
+class PreRollBuffer:
+    """Ring buffer with the last few hundred milliseconds of audio from the always-open stream"""
+
+    def __init__(self, size, frame_bytes):
+        self.buffer = bytearray(size - size % frame_bytes)
+        self.position = 0
+        self.filled = 0
+
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        size = len(self.buffer)
+        if len(view) >= size:
+            self.buffer[:] = view[len(view) - size:]
+            self.position = 0
+            self.filled = size
+            return
+
+        first = min(len(view), size - self.position)
+        self.buffer[self.position:self.position + first] = view[:first]
+        self.buffer[:len(view) - first] = view[first:]
+        self.position = (self.position + len(view)) % size
+        self.filled = min(size, self.filled + len(view))
+
+    def snapshot(self):
+        """The buffered audio, oldest first"""
+        if self.filled < len(self.buffer):
+            return bytes(self.buffer[:self.filled])
+        return bytes(self.buffer[self.position:]) + bytes(self.buffer[:self.position])
+
+
+class Resampler:
+    """Converts 16-bit PCM between sample rates and channel counts, one block at a time
+
+    A polyphase windowed-sinc filter: every output sample is one dot product of a
+    short window of input with one of `up` precomputed filter phases, done for a
+    whole block at once with numpy. The last few input samples are carried over
+    to the next block, so a stream converted block by block comes out exactly as
+    if it had been converted in one piece.
+    """
+
+    TAPS = 32  # Filter taps per phase (input samples per output sample)
+    STRIDED_PHASES = 8  # Up to this many phases, filter each one over a strided view
+    KAISER_BETA = 8.0
+
+    def __init__(self, in_rate, in_channels, out_rate, out_channels):
+        import_numpy()
+        if out_channels not in (1, in_channels):
+            raise ValueError("can only downmix to mono, not {} to {} channels".format(in_channels, out_channels))
+        self.in_channels = in_channels
+        self.out_channels = out_channels
+
+        divisor = math.gcd(in_rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.filters = self.design_filters(self.up, self.down) if self.up != self.down else None
+
+        self.history = np.zeros((self.TAPS - 1, out_channels), dtype=np.float32)
+        self.in_count = 0  # Input frames seen so far
+        self.out_count = 0  # Output frames produced so far
+
+    @classmethod
+    def design_filters(cls, up, down):
+        """Kaiser-windowed low-pass split into `up` phases, each reversed to match a window of input"""
+        import_numpy()
+        length = cls.TAPS * up
+        # Cut off a little below the lower of the two Nyquist frequencies, at the upsampled rate
+        cutoff = 0.5 / max(up, down) * 0.95
+        t = np.arange(length) - (length - 1) / 2.0
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, cls.KAISER_BETA) * up
+        return np.ascontiguousarray(prototype.reshape(cls.TAPS, up).T[:, ::-1], dtype=np.float32)
+
+    def process(self, data):
+        """Convert the next block of PCM bytes, returning PCM bytes in the output format"""
+        if not len(data):
+            return b''  # The history alone is one frame short of a filter window
+        samples = np.frombuffer(data, dtype=np.int16).reshape(-1, self.in_channels)
+        if self.out_channels != self.in_channels:
+            samples = samples.mean(axis=1, dtype=np.float32, keepdims=True)
+        if self.filters is None:
+            return np.rint(samples).astype(np.int16).tobytes() if samples.dtype != np.int16 else bytes(data)
+
+        buffer = np.concatenate((self.history, samples.astype(np.float32, copy=False)))
+        total = self.in_count + len(samples)
+        # Output frame n is computed from the input window ending at frame n * down // up
+        end = -(-total * self.up // self.down)
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.TAPS, axis=0)
+        if self.up <= self.STRIDED_PHASES:
+            # Every up-th output uses the same phase, and its windows are `down` frames apart:
+            # a strided view of the input instead of a gathered copy of every window
+            output = np.empty((end - self.out_count, self.out_channels), dtype=np.float32)
+            for offset in range(min(self.up, len(output))):
+                position = (self.out_count + offset) * self.down
+                first = position // self.up - self.in_count
+                count = len(output[offset::self.up])
+                output[offset::self.up] = np.einsum(
+                    'ick,k->ic',
+                    windows[first:first + (count - 1) * self.down + 1:self.down],
+                    self.filters[position % self.up]
                 )
-                print("Warning: Duplicate hotkey '{}' in configs '{}' and '{}'. Skipping '{}'.".format(
-                    config_data['hotkey'],
-                    self.hotkey_map[hotkey_code],
-                    config_name,
-                    config_name
-                ))
+        else:
+            positions = np.arange(self.out_count, end, dtype=np.int64) * self.down
+            output = np.einsum(
+                'ick,ik->ic',
+                windows[positions // self.up - self.in_count],
+                self.filters[positions % self.up]
+            )
+
+        self.history = buffer[len(buffer) - (self.TAPS - 1):].copy()
+        self.in_count = total
+        self.out_count = end
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16).tobytes()
+
+
+class FairQueue:
+    """Bounded queue of requests from several clients, served round-robin between clients
+
+    A client with many queued requests can't make the others wait behind all of
+    them, and can't fill the queue on its own either (per_client limit).
+    """
+
+    def __init__(self, limit, per_client):
+        self.limit = limit
+        self.per_client = per_client
+        self.clients = collections.OrderedDict()  # client -> deque of requests, next to serve first
+        self.size = 0
+        self.reserved = collections.Counter()  # client -> places held for requests still arriving
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def full(self, client):
+        requests = self.clients.get(client)
+        pending = (len(requests) if requests else 0) + self.reserved[client]
+        return self.size + sum(self.reserved.values()) >= self.limit or pending >= self.per_client
+
+    def reserve(self, client):
+        """Hold a place for a request before receiving it, False if there's none"""
+        with self.condition:
+            if self.full(client):
+                return False
+            self.reserved[client] += 1
+            return True
+
+    def release(self, client):
+        """Give back a reserved place that won't be used"""
+        with self.condition:
+            self.reserved[client] -= 1
+            if self.reserved[client] <= 0:
+                del self.reserved[client]
+
+    def put(self, client, request):
+        """Queue a request in its reserved place, False if it has none and the queue (or the client's share) is full"""
+        with self.condition:
+            if self.reserved[client]:
+                self.reserved[client] -= 1
+                if not self.reserved[client]:
+                    del self.reserved[client]
+            elif self.full(client):
+                return False
+            requests = self.clients.get(client)
+            if requests is None:
+                requests = self.clients[client] = collections.deque()
+            requests.append(request)
+            self.size += 1
+            self.condition.notify()
+            return True
+
+    def get(self):
+        """Next request in round-robin order, waiting for one; None once closed"""
+        with self.condition:
+            while not self.clients and not self.closed:
+                self.condition.wait()
+            if not self.clients:
+                return None
+            client, requests = next(iter(self.clients.items()))
+            request = requests.popleft()
+            if requests:
+                self.clients.move_to_end(client)
             else:
-                self.hotkey_map[hotkey_code] = config_name
+                del self.clients[client]
+            self.size -= 1
+            return request
 
-        self.hotkey_thread = None
+    def depths(self):
+        with self.condition:
+            return {client: len(requests) for client, requests in self.clients.items()}
 
-    def load_configs(self):
-        """Load all configuration files from configs/ directory"""
-        configs_dir = Path(__file__).parent / 'configs'
-        configs = {}
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class TranscriptionJob(collections.namedtuple('TranscriptionJob', [
+        'id', 'config_name', 'config', 'capture', 'streamer', 'timings', 'cancelled'])):
+    """One recording with its own audio, config snapshot and cancel flag
+
+    The tuple itself is immutable; capture, timings and the cancelled Event are
+    owned by the job, so a new recording can start while this one is processed.
+    """
+
+    __slots__ = ()
+
+
+class StreamingTranscriber:
+    """Cuts a recording at pauses and transcribes finished segments while recording continues"""
+
+    def __init__(self, config, capture, transcribe_range, timings=None):
+        self.config = config
+        self.capture = capture
+        self.transcribe_range = transcribe_range
+        self.timings = timings
+        self.bytes_per_second = config['sample_rate'] * config['channels'] * 2
+        self.threshold = config.get('silence_threshold', 500)
+
+        # Segment currently being captured, as byte offsets into the capture buffer
+        self.segment_start = 0
+        self.segment_end = 0
+        self.silent_bytes = 0
+        self.has_speech = False
+
+        self.segments = queue.Queue()
+        self.results = []
+        self.cancelled = False
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def feed(self, data):
+        """Account for a block just written to the capture buffer (called from the audio callback)"""
+        self.segment_end += len(data)
+
+        if pcm_rms(data) < self.threshold:
+            self.silent_bytes += len(data)
+        else:
+            self.silent_bytes = 0
+            self.has_speech = True
+
+        duration = (self.segment_end - self.segment_start) / self.bytes_per_second
+        pause = self.silent_bytes / self.bytes_per_second
+        at_pause = (
+            duration >= self.config.get('stream_min_segment', 5)
+            and pause >= self.config.get('stream_pause_duration', 0.6)
+        )
+        if at_pause or duration >= self.config.get('stream_max_segment', 30):
+            self.cut()
+
+    def cut(self):
+        """Queue the current segment for transcription and start a new one"""
+        # Segments with no speech would only produce [BLANK_AUDIO] or hallucinations
+        if self.has_speech:
+            self.segments.put((self.segment_start, self.segment_end))
+        self.segment_start = self.segment_end
+        self.silent_bytes = 0
+        self.has_speech = False
+
+    def run(self):
+        """Background worker transcribing segments in recording order"""
+        while True:
+            segment = self.segments.get()
+            if segment is None or self.cancelled:
+                return
+            text = self.transcribe_range(self.capture, segment[0], segment[1], self.config, self.timings)
+            if text:
+                self.results.append(text)
+
+    def finish(self):
+        """Transcribe the final segment, wait for the backlog and return the stitched text"""
+        self.cut()
+        self.segments.put(None)
+        self.worker.join()
+        if self.cancelled:
+            return None
+        return ' '.join(self.results) or None
+
+    def cancel(self):
+        """Drop pending segments and stop the worker after the current one"""
+        self.cancelled = True
+        self.segments.put(None)
+
+
+class WhisperServer:
+    """Long-lived whisper.cpp server process that keeps one model loaded between utterances"""
+
+    def __init__(self, server_path, model_file, startup_timeout=60, extra_args=()):
+        self.server_path = server_path
+        self.model_file = model_file
+        self.extra_args = list(extra_args)  # e.g. -t/-p
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.port = None
+        self.starts = 0  # Processes started so far, requests that waited for one aren't timed
+        # whisper-server decodes one request at a time, so serialize our requests too
+        self.lock = threading.Lock()
+
+    def is_running(self):
+        """Check whether the server process is alive"""
+        return self.process is not None and self.process.poll() is None
+
+    def ensure_running(self):
+        """Start the server (or restart it after a crash) and wait until it accepts connections"""
+        if self.is_running():
+            return
+
+        if self.process is not None:
+            print("whisper-server for {} exited with code {}, restarting...".format(
+                self.model_file.name, self.process.returncode
+            ))
+
+        self.port = find_free_port()
+        self.starts += 1
+        self.process = subprocess.Popen(
+            [
+                str(self.server_path),
+                '-m', str(self.model_file),
+                '--host', '127.0.0.1',
+                '--port', str(self.port)
+            ] + self.extra_args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        # The server only starts listening once the model is loaded
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("whisper-server exited during startup with code {}".format(
+                    self.process.returncode
+                ))
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.5):
+                    print("whisper-server ready with model '{}' on port {}".format(
+                        self.model_file.name, self.port
+                    ))
+                    return
+            except OSError:
+                time.sleep(0.1)
+
+        self.stop()
+        raise RuntimeError("whisper-server did not start within {}s".format(self.startup_timeout))
+
+    def transcribe(self, wav_chunks, timeout):
+        """Send WAV data (a list of buffers) to the server and return the transcript text"""
+        with self.lock:
+            self.ensure_running()
+
+            # Stream the buffers as the multipart body instead of joining them into one copy
+            boundary = uuid.uuid4().hex
+            body = [
+                '--{}\r\n'.format(boundary).encode(),
+                b'Content-Disposition: form-data; name="response_format"\r\n\r\n',
+                b'text\r\n',
+                '--{}\r\n'.format(boundary).encode(),
+                b'Content-Disposition: form-data; name="file"; filename="audio.wav"\r\n',
+                b'Content-Type: audio/wav\r\n\r\n'
+            ] + list(wav_chunks) + ['\r\n--{}--\r\n'.format(boundary).encode()]
+
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=timeout)
+            try:
+                conn.request('POST', '/inference', body=body, headers={
+                    'Content-Type': 'multipart/form-data; boundary=' + boundary,
+                    'Content-Length': str(sum(len(memoryview(chunk)) for chunk in body))
+                })
+                response = conn.getresponse()
+                data = response.read()
+            except socket.timeout:
+                # A stuck server would block every later utterance, start fresh next time
+                self.stop()
+                raise
+            finally:
+                conn.close()
+
+            if response.status != 200:
+                raise RuntimeError("whisper-server returned HTTP {}: {}".format(
+                    response.status, data.decode('utf-8', 'replace').strip()
+                ))
+
+            return data.decode('utf-8')
+
+    def stop(self):
+        """Terminate the server process"""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+
+class TranscriptionClient:
+    """Sends recordings to a shared transcription service (verbose.py serve)
+
+    Every request is a JSON header line. For audio, the service first answers
+    {"ready": true} (or an error such as "busy") and only then gets the PCM the
+    header announces, so nothing is uploaded to a full queue. The answer is one
+    JSON line. A busy service is retried with backoff until the timeout runs out. Its answers end up typed into the session, so on a Unix
+    socket the service must run as one of trusted_uids (SO_PEERCRED).
+    """
+
+    PEER_CREDENTIALS = struct.Struct('iII')  # pid, uid, gid
+
+    def __init__(self, address, client_name, timeout, trusted_uids=None):
+        self.address = address
+        self.client_name = client_name
+        self.timeout = timeout
+        self.trusted_uids = trusted_uids  # None: don't check (statistics only)
+
+    def request(self, header, frames=(), deadline=None):
+        family, address = parse_address(self.address)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(max(0.1, deadline - time.monotonic()) if deadline else self.timeout)
+            sock.connect(address)
+            if family == socket.AF_UNIX and self.trusted_uids is not None:
+                self.check_peer(sock)
+            sock.sendall((json.dumps(header) + '\n').encode('utf-8'))
+            with sock.makefile('rb') as reader:
+                if 'bytes' in header:
+                    reply = self.read_reply(reader)
+                    if not reply.get('ready'):
+                        return reply
+                    for frame in frames:
+                        sock.sendall(frame)
+                return self.read_reply(reader)
+
+    @staticmethod
+    def read_reply(reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("transcription service closed the connection")
+        return json.loads(line)
+
+    def check_peer(self, sock):
+        """Refuse a service started by another user at the socket path"""
+        credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, self.PEER_CREDENTIALS.size)
+        _, uid, _ = self.PEER_CREDENTIALS.unpack(credentials)
+        if uid not in self.trusted_uids:
+            raise PermissionError("transcription service at {} runs as UID {}, not a trusted user (remote_user)".format(
+                self.address, uid
+            ))
+
+    def transcribe(self, frames, sample_rate, channels, model):
+        """Transcript of PCM frames, raising socket.timeout if the service stays busy"""
+        frames = list(frames)
+        header = {
+            'client': self.client_name,
+            'model': model,
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'bytes': sum(len(frame) for frame in frames),
+        }
+        deadline = time.monotonic() + self.timeout
+        delay = 0.1
+        while True:
+            reply = self.request(header, frames, deadline)
+            if reply.get('error') != 'busy':
+                break
+            if time.monotonic() + delay >= deadline:
+                raise socket.timeout("transcription service stayed busy")
+            time.sleep(delay)
+            delay = min(2.0, delay * 2)
+
+        if 'error' in reply:
+            raise RuntimeError("transcription service: " + reply['error'])
+        return reply['text']
+
+    def stats(self):
+        return self.request({'stats': True})
+
+
+def reference_clip(seconds=10, sample_rate=16000):
+    """Synthetic speech-like audio (voiced harmonics in syllable-length bursts) as 16-bit PCM"""
+    import_numpy()
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)  # Slowly gliding voice pitch
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 12))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2  # ~4 syllables per second
+    pauses = (np.sin(2 * np.pi * 0.25 * t) > -0.7)  # A short breath every few seconds
+    audio = voice * syllables * pauses + 0.02 * rng.standard_normal(len(t))
+    audio *= 8000 / np.max(np.abs(audio))
+    return audio.astype('<i2').tobytes()
+
+
+class Calibrator:
+    """Time whisper-cli with every downloaded model over a sweep of thread and processor counts
+
+    Each combination transcribes the same reference clip. The fastest one wins; among
+    combinations within a few percent of it, the one using the least CPU time is kept.
+    """
+
+    TOLERANCE = 0.05  # Results this close to the fastest count as equally fast
+
+    def __init__(self, whisper_path, model_dir, clip=None, runs=1, timeout=600):
+        self.whisper_path = Path(whisper_path)
+        self.model_dir = Path(model_dir)
+        self.clip = clip  # WAV file (16 kHz mono) to use instead of the synthetic clip
+        self.runs = runs
+        self.timeout = timeout
+        self.cpu_count = os.cpu_count() or 1
+
+    def models(self, names=None):
+        """Downloaded models (ggml-<name>.bin, quantized variants included)"""
+        found = sorted(path.name[len('ggml-'):-len('.bin')] for path in self.model_dir.glob('ggml-*.bin'))
+        if names:
+            found = [model for model in found if model in names]
+        return found
+
+    def settings(self):
+        """(threads, processors) pairs to try, never using more threads than CPUs"""
+        counts = sorted({count for count in (1, 2, 4, 6, 8, 12, 16, 24, 32) if count < self.cpu_count}
+                        | {self.cpu_count})
+        pairs = []
+        for processors in (1, 2, 4):
+            for threads in counts:
+                if threads * processors <= self.cpu_count and (processors == 1 or threads > 1):
+                    pairs.append((threads, processors))
+        return pairs
+
+    def measure(self, model, wav_path, threads, processors):
+        """Best wall time and CPU seconds of whisper-cli over the configured runs"""
+        best = None
+        for _ in range(self.runs):
+            usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+            start = time.monotonic()
+            result = subprocess.run(
+                [
+                    str(self.whisper_path),
+                    '-m', str(self.model_dir / ('ggml-' + model + '.bin')),
+                    '-t', str(threads),
+                    '-p', str(processors),
+                    '--no-timestamps',
+                    '--no-prints',
+                    '-f', wav_path
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout
+            )
+            wall = time.monotonic() - start
+            usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            if result.returncode != 0:
+                raise RuntimeError("whisper-cli exited with code {}: {}".format(
+                    result.returncode, result.stderr.decode('utf-8', 'replace').strip()[-200:]
+                ))
+            cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+            if best is None or wall < best[0]:
+                best = (wall, cpu)
+        return best
+
+    def run(self, models=None):
+        """Calibrate every model, returning the calibration file contents"""
+        if self.clip:
+            wav_path = str(self.clip)
+            with wave.open(wav_path, 'rb') as wf:
+                clip_seconds = wf.getnframes() / wf.getframerate()
+            temp_path = None
+        else:
+            clip_seconds = 10
+            data = reference_clip(clip_seconds)
+            fd, temp_path = tempfile.mkstemp(suffix='.wav', prefix='verbose-calibrate-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(wav_header(len(data), 16000, 1))
+                f.write(data)
+            wav_path = temp_path
+
+        results = {}
+        try:
+            for model in self.models(models):
+                print("Calibrating '{}'...".format(model))
+                timings = []
+                for threads, processors in self.settings():
+                    try:
+                        wall, cpu = self.measure(model, wav_path, threads, processors)
+                    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+                        print("  -t {} -p {}: failed ({})".format(threads, processors, str(e)))
+                        continue
+                    print("  -t {} -p {}: {:.2f}s wall, {:.2f}s CPU".format(threads, processors, wall, cpu))
+                    timings.append((wall, cpu, threads, processors))
+
+                if not timings:
+                    continue
+                fastest = min(timing[0] for timing in timings)
+                wall, cpu, threads, processors = min(
+                    (timing for timing in timings if timing[0] <= fastest * (1 + self.TOLERANCE)),
+                    key=lambda timing: timing[1]
+                )
+                results[model] = {
+                    'threads': threads,
+                    'processors': processors,
+                    'seconds': round(wall, 3),
+                    'cpu_seconds': round(cpu, 3),
+                    'realtime_factor': round(wall / clip_seconds, 4)
+                }
+        finally:
+            if temp_path:
+                os.unlink(temp_path)
+
+        return {
+            'cpu_count': self.cpu_count,
+            'clip_seconds': round(clip_seconds, 2),
+            'models': results
+        }
+
+    def write(self, calibration, path):
+        header = (
+            "# Generated by verbose.py --calibrate on {}, run it again after changing hardware\n"
+            "# or whisper.cpp builds. whisper_threads/whisper_processors in a config override these.\n"
+        ).format(time.strftime('%Y-%m-%d'))
+        with open(path, 'w') as f:
+            f.write(header)
+            yaml.safe_dump(calibration, f, sort_keys=False)
+
+
+class UInputSink:
+    """Virtual keyboard on /dev/uinput, taking a whole batch of events in one write"""
+
+    EVENT = struct.Struct('llHHi')  # struct input_event: timeval, type, code, value
+    DEVICE_NAME = 'verbose-typer'
+
+    def __init__(self):
+        # Declares every key, so paste chords work as well as typed text
+        self.device = evdev.UInput(name=self.DEVICE_NAME)
+        # The compositor has to pick up the new device before it sees any keys from it
+        time.sleep(0.2)
+
+    def write(self, events):
+        os.write(self.device.fd, b''.join(self.EVENT.pack(0, 0, *event) for event in events))
+
+    def close(self):
+        self.device.close()
+
+
+class YdotooldSink:
+    """Sends key events to a running ydotoold, which owns the virtual keyboard
+
+    ydotoold reads one event per datagram, so batches still cost a send per event,
+    but no process is started per utterance.
+    """
+
+    EVENT = struct.Struct('llHHi')
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('YDOTOOL_SOCKET', '/tmp/.ydotool_socket')
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.socket.connect(self.path)
+        except OSError:
+            self.socket.close()
+            raise
+
+    def write(self, events):
+        for event in events:
+            self.socket.send(self.EVENT.pack(0, 0, *event))
+
+    def close(self):
+        self.socket.close()
+
+
+class FakeUInputSink:
+    """Records key events instead of sending them, for tests and benchmarks"""
+
+    def __init__(self):
+        self.events = []  # (type, code, value)
+        self.writes = 0
+
+    def write(self, events):
+        self.events.extend(events)
+        self.writes += 1
+
+    def close(self):
+        pass
+
+    def text(self, keymap):
+        """The text the recorded key presses type with a KeyboardTyper keymap"""
+        characters = {value: character for character, value in reversed(list(keymap.items()))}
+        shift = False
+        typed = []
+        for event_type, code, value in self.events:
+            if event_type != ecodes.EV_KEY:
+                continue
+            if code == ecodes.KEY_LEFTSHIFT:
+                shift = value == 1
+            elif value == 1:
+                typed.append(characters.get((code, shift), '?'))
+        return ''.join(typed)
+
+
+class KeyboardTyper:
+    """Types text as key events for a US keyboard layout, in chunks that can be cancelled
+
+    All events of one key (shift, press, release, sync) go to the sink in a single
+    write, and a whole chunk goes in one write when there's no key delay. With
+    adaptive pacing the delay goes up when the system falls behind and back down
+    when it keeps up.
+    """
+
+    CHUNK_SIZE = 32  # Characters typed between cancellation checks
+    MIN_DELAY = 0.001
+    MAX_DELAY = 0.02
+    # Typography whisper likes to produce, typed as its ASCII equivalent
+    REPLACEMENTS = {
+        '\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"',
+        '\u2013': '-', '\u2014': '-', '\u2026': '...', '\u00a0': ' ',
+    }
+
+    def __init__(self, sink, key_delay=0.005, adaptive=False):
+        self.sink = sink
+        self.key_delay = key_delay
+        self.adaptive = adaptive
+        self.keymap = self.build_keymap()
+        self.unsent = ''  # Text left over when the sink failed
+
+    @staticmethod
+    def build_keymap():
+        """Character -> (key code, shift) for the US layout"""
+        names = {
+            '`': 'GRAVE', '-': 'MINUS', '=': 'EQUAL', '[': 'LEFTBRACE', ']': 'RIGHTBRACE',
+            '\\': 'BACKSLASH', ';': 'SEMICOLON', "'": 'APOSTROPHE', ',': 'COMMA', '.': 'DOT',
+            '/': 'SLASH', ' ': 'SPACE', '\n': 'ENTER', '\t': 'TAB',
+        }
+        for character in 'abcdefghijklmnopqrstuvwxyz0123456789':
+            names[character] = character.upper()
+
+        keymap = {}
+        for character, name in names.items():
+            keymap[character] = (getattr(ecodes, 'KEY_' + name), False)
+        for shifted, plain in zip('~!@#$%^&*()_+{}|:"<>?', '`1234567890-=[]\\;\',./'):
+            keymap[shifted] = (keymap[plain][0], True)
+        for character in 'abcdefghijklmnopqrstuvwxyz':
+            keymap[character.upper()] = (keymap[character][0], True)
+        return keymap
+
+    def key_events(self, character):
+        code, shift = self.keymap[character]
+        events = []
+        if shift:
+            events.append((ecodes.EV_KEY, ecodes.KEY_LEFTSHIFT, 1))
+        events += [(ecodes.EV_KEY, code, 1), (ecodes.EV_SYN, 0, 0), (ecodes.EV_KEY, code, 0)]
+        if shift:
+            events.append((ecodes.EV_KEY, ecodes.KEY_LEFTSHIFT, 0))
+        events.append((ecodes.EV_SYN, 0, 0))
+        return events
+
+    def type(self, text, cancelled=None):
+        """Type text, stopping between keys once cancelled is set; returns characters typed
+
+        If the sink fails, the OSError is raised with the text not typed yet in self.unsent.
+        """
+        for original, replacement in self.REPLACEMENTS.items():
+            text = text.replace(original, replacement)
+        missing = sorted(set(character for character in text if character not in self.keymap))
+        if missing:
+            print("Can't type {} with the US layout, skipping (insert_mode: paste can)".format(
+                ' '.join(repr(character) for character in missing)
+            ))
+            text = ''.join(character for character in text if character in self.keymap)
+
+        self.unsent = ''
+        typed = 0
+        for chunk_start in range(0, len(text), self.CHUNK_SIZE):
+            if cancelled is not None and cancelled.is_set():
+                break
+            chunk = text[chunk_start:chunk_start + self.CHUNK_SIZE]
+
+            try:
+                if not self.key_delay:
+                    self.sink.write([event for character in chunk for event in self.key_events(character)])
+                    typed += len(chunk)
+                    continue
+
+                start = time.monotonic()
+                for character in chunk:
+                    if cancelled is not None and cancelled.is_set():
+                        return typed
+                    self.sink.write(self.key_events(character))
+                    typed += 1
+                    time.sleep(self.key_delay)
+            except OSError:
+                self.unsent = text[typed:]
+                raise
+
+            if self.adaptive:
+                expected = len(chunk) * self.key_delay
+                if time.monotonic() - start > 1.5 * expected:
+                    # Sleeps are overshooting, the system is busy: slow down before keys get dropped
+                    self.key_delay = min(self.MAX_DELAY, self.key_delay * 2)
+                else:
+                    self.key_delay = max(self.MIN_DELAY, self.key_delay * 0.8)
+        return typed
+
+    def chord(self, codes):
+        """Press keys in order and release them in reverse, e.g. ctrl+shift+v"""
+        events = [(ecodes.EV_KEY, code, 1) for code in codes] + [(ecodes.EV_SYN, 0, 0)]
+        events += [(ecodes.EV_KEY, code, 0) for code in reversed(codes)] + [(ecodes.EV_SYN, 0, 0)]
+        self.sink.write(events)
+
+
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+def inotify_watch(directory, mask):
+    """inotify file descriptor watching a directory for the events in mask"""
+    libc = ctypes.CDLL(None, use_errno=True)
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+    if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+        error = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(error, os.strerror(error))
+    return fd
+
+
+class ConfigWatcher:
+    """Report which config files in a directory were written, renamed or deleted
+
+    Uses inotify so nothing runs until a file changes, and falls back to comparing
+    modification times every few seconds where inotify isn't available. Bursts of
+    events (editors saving through a temporary file) are reported together.
+    """
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_DELETE = 0x200
+
+    def __init__(self, directory, callback, debounce=0.25, poll_interval=2.0):
+        self.directory = Path(directory)
+        self.callback = callback  # Called with the set of changed config names
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+
+    def run(self):
+        try:
+            fd = inotify_watch(self.directory, self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE)
+        except (OSError, AttributeError) as e:
+            print("inotify unavailable ({}), checking configs/ for changes every {}s".format(
+                str(e), self.poll_interval
+            ))
+            self.poll()
+            return
 
-        # Default config values
-        default_config = {
-            'hotkey': '<f9>',
-            'whisper_model': 'base',
-            'whisper_cpp_path': './whisper.cpp/build/bin/whisper-cli',
-            'sample_rate': 16000,
-            'channels': 1,
-            'avoid_newlines': False,
-            'whisper_timeout': 300,  # 5 minutes for long recordings
-            'debug_keep_temp_files': False,  # Keep temp files on failure for debugging
-            'dictionary': {},
-            'shortcuts': {}
+        try:
+            while True:
+                changed = self.read_events(fd)
+                # Keep collecting until the directory has been quiet for a moment
+                while select.select([fd], [], [], self.debounce)[0]:
+                    changed |= self.read_events(fd)
+                if changed:
+                    self.report(changed)
+        finally:
+            os.close(fd)
+
+    def read_events(self, fd):
+        """Names of the .yaml files mentioned in one read of inotify events"""
+        buffer = os.read(fd, 4096)
+        changed = set()
+        offset = 0
+        while offset < len(buffer):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            name = buffer[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+            if name.endswith('.yaml'):
+                changed.add(name[:-len('.yaml')])
+        return changed
+
+    def snapshot(self):
+        files = {}
+        for path in self.directory.glob('*.yaml'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files[path.stem] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def poll(self):
+        previous = self.snapshot()
+        while True:
+            time.sleep(self.poll_interval)
+            current = self.snapshot()
+            changed = {name for name in previous.keys() | current.keys()
+                       if previous.get(name) != current.get(name)}
+            previous = current
+            if changed:
+                self.report(changed)
+
+    def report(self, changed):
+        try:
+            self.callback(changed)
+        except Exception as e:
+            print("Config reload error: " + str(e))
+
+
+class KeyboardMonitor:
+    """Reads key presses from every keyboard in one thread, including keyboards plugged in later
+
+    The keyboards and an inotify watch on /dev/input share one selector (epoll), so
+    the thread sleeps until a key is pressed or a device comes or goes, however many
+    devices are attached. An unplugged keyboard is dropped instead of ending the
+    thread. Held modifiers are tracked per keyboard.
+    """
+
+    DIRECTORY = '/dev/input'
+    IN_ATTRIB = 0x004  # udev gives new device nodes their group after creating them
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    CTRL, SHIFT, ALT, META = 1, 2, 4, 8  # Modifier mask bits
+    MODIFIER_NAMES = {'ctrl': CTRL, 'shift': SHIFT, 'alt': ALT, 'cmd': META, 'super': META, 'meta': META}
+    # Name prefixes of virtual keyboards that type for us ('ydotoold virtual device' and
+    # older 'ydotool virtual device'): their keys would trigger hotkeys and confuse modifiers
+    TYPING_DEVICES = (UInputSink.DEVICE_NAME, 'ydotool')
+
+    def __init__(self, callback, poll_interval=2.0):
+        self.callback = callback  # Called with (modifier mask, key code) for every key press
+        self.poll_interval = poll_interval  # Rescan interval when inotify isn't available
+        self.selector = selectors.DefaultSelector()
+        self.devices = {}  # path -> InputDevice of every keyboard in use
+        self.held = {}  # path -> {modifier key code: mask bit} currently held on that keyboard
+        self.ignored = set()  # Paths of devices that aren't keyboards
+        self.modifier_bits = {
+            ecodes.KEY_LEFTCTRL: self.CTRL, ecodes.KEY_RIGHTCTRL: self.CTRL,
+            ecodes.KEY_LEFTSHIFT: self.SHIFT, ecodes.KEY_RIGHTSHIFT: self.SHIFT,
+            ecodes.KEY_LEFTALT: self.ALT, ecodes.KEY_RIGHTALT: self.ALT,
+            ecodes.KEY_LEFTMETA: self.META, ecodes.KEY_RIGHTMETA: self.META,
         }
 
+    @staticmethod
+    def is_keyboard(device):
+        """Whether a device has letter keys and function or number keys (not a mouse, power button or typer)"""
+        if device.name.lower().startswith(KeyboardMonitor.TYPING_DEVICES):
+            return False
+        keys = device.capabilities().get(ecodes.EV_KEY, [])
+        has_f_keys = any(k in keys for k in [ecodes.KEY_F1, ecodes.KEY_F9, ecodes.KEY_F10])
+        has_letters = ecodes.KEY_A in keys or ecodes.KEY_Q in keys
+        has_numbers = ecodes.KEY_1 in keys or ecodes.KEY_2 in keys
+        return has_letters and (has_f_keys or has_numbers)
+
+    def add_device(self, path):
+        if path in self.devices or path in self.ignored:
+            return
+        try:
+            device = evdev.InputDevice(path)
+        except OSError:
+            return  # Not readable (yet), an IN_ATTRIB event brings it back
+        try:
+            if not self.is_keyboard(device):
+                device.close()
+                self.ignored.add(path)
+                return
+            self.selector.register(device.fd, selectors.EVENT_READ, path)
+        except (OSError, ValueError):
+            # Gone again right away (ydotool and typer devices come and go)
+            try:
+                device.close()
+            except OSError:
+                pass
+            return
+        self.devices[path] = device
+        self.held[path] = {}
+        print("Using keyboard: " + device.name)
+
+    def remove_device(self, path):
+        self.ignored.discard(path)
+        device = self.devices.pop(path, None)
+        if device is None:
+            return
+        del self.held[path]
+        self.selector.unregister(device.fd)
+        try:
+            device.close()
+        except OSError:
+            pass
+        print("Keyboard removed: " + device.name)
+
+    def scan(self):
+        """Pick up every keyboard present now and drop the ones that are gone"""
+        present = set(evdev.list_devices())
+        for path in list(self.devices) + list(self.ignored):
+            if path not in present:
+                self.remove_device(path)
+        for path in sorted(present):
+            self.add_device(path)
+        return len(self.devices)
+
+    def read_device(self, path):
+        device = self.devices.get(path)
+        if device is None:
+            return  # Removed earlier in the same batch of events
+        held = self.held[path]
+        try:
+            for event in device.read():
+                if event.type != ecodes.EV_KEY:
+                    continue
+                if event.value == 1:  # Press, not release (0) or auto-repeat (2)
+                    mask = 0
+                    for bit in held.values():
+                        mask |= bit
+                    self.callback(mask, event.code)
+                bit = self.modifier_bits.get(event.code)
+                if bit is not None:
+                    if event.value:
+                        held[event.code] = bit
+                    else:
+                        held.pop(event.code, None)
+        except BlockingIOError:
+            pass
+        except OSError:
+            # ENODEV: unplugged, inotify reports the deletion too
+            self.remove_device(path)
+
+    def read_hotplug(self, fd):
+        buffer = os.read(fd, 4096)
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            name = buffer[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+            if not name.startswith('event'):
+                continue
+            path = os.path.join(self.DIRECTORY, name)
+            if mask & self.IN_DELETE:
+                self.remove_device(path)
+            else:
+                self.add_device(path)
+
+    def run(self):
+        try:
+            fd = inotify_watch(self.DIRECTORY, self.IN_CREATE | self.IN_ATTRIB | self.IN_DELETE)
+            self.selector.register(fd, selectors.EVENT_READ, None)
+        except (OSError, AttributeError) as e:
+            print("inotify unavailable ({}), checking for new keyboards every {}s".format(
+                str(e), self.poll_interval
+            ))
+            fd = None
+
+        try:
+            while True:
+                for key, _ in self.selector.select(None if fd is not None else self.poll_interval):
+                    try:
+                        if key.data is None:
+                            self.read_hotplug(fd)
+                        else:
+                            self.read_device(key.data)
+                    except Exception as e:
+                        # One misbehaving device mustn't end the listener
+                        print("Hotkey listener error: " + str(e))
+                if fd is None:
+                    self.scan()
+        except Exception as e:
+            print("Hotkey listener error: " + str(e))
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def close(self):
+        for path in list(self.devices):
+            self.remove_device(path)
+
+
+class Transcriber:
+    """Configs, whisper.cpp and text post-processing, shared by the daemon and batch mode"""
+
+    def __init__(self):
+        self.configs = self.load_configs()  # Dict of config_name -> CompiledConfig
+        self.whisper_servers = {}  # model file path -> WhisperServer (persistent backend)
+        self.whisper_servers_lock = threading.Lock()
+        self.metrics = Metrics()
+        self.model_speeds = ModelSpeeds()  # Learned real-time factors for latency_budget
+        self.whisper_run = threading.local()  # .cold: this thread's last run included a model load
+        self.split_recordings = True  # Off when recordings already run side by side (batch --jobs)
+        self.calibration = self.load_calibration()  # model -> tuned whisper.cpp settings
+
+    def load_configs(self, configs_dir=None):
+        """Load and compile all configuration files from configs/ directory"""
+        configs_dir = Path(configs_dir or Path(__file__).parent / 'configs')
+        self.configs_dir = configs_dir
+        configs = {}
+
         # If configs directory doesn't exist, create it with a default config
         if not configs_dir.exists():
             print("configs/ directory not found, creating with default config...")
             configs_dir.mkdir()
-            configs['default'] = default_config
-            return configs
+            return self.default_configs()
 
         # Load all .yaml files from configs/
-        yaml_files = list(configs_dir.glob('*.yaml'))
-
-        # Filter out sample.yaml
-        yaml_files = [f for f in yaml_files if f.stem != 'sample']
+        yaml_files = [f for f in configs_dir.glob('*.yaml') if self.is_config_file(f)]
 
         if not yaml_files:
             print("No config files found in configs/, using defaults")
-            configs['default'] = default_config
-            return configs
+            return self.default_configs()
 
         for config_file in yaml_files:
             config_name = config_file.stem  # Filename without extension
             try:
-                with open(config_file) as f:
-                    loaded_config = yaml.safe_load(f) or {}
-
-                    # Extract dictionary and shortcuts
-                    dictionary = loaded_config.pop('dictionary', {})
-                    shortcuts = loaded_config.pop('shortcuts', {})
-
-                    # Merge with defaults
-                    final_config = {**default_config, **loaded_config}
-                    final_config['dictionary'] = dictionary
-                    final_config['shortcuts'] = shortcuts
-
-                    configs[config_name] = final_config
-                    print("Loaded config '{}' with hotkey '{}'".format(
-                        config_name, final_config['hotkey']
-                    ))
+                configs[config_name] = self.load_config_file(config_file)
+                print("Loaded config '{}' with hotkey '{}'".format(
+                    config_name, configs[config_name]['hotkey']
+                ))
             except Exception as e:
                 print("Error loading {}: {}".format(config_file, str(e)))
 
         if not configs:
             print("No valid configs loaded, using defaults")
-            configs['default'] = default_config
+            return self.default_configs()
 
         return configs
 
-    def find_keyboard(self):
-        """Find keyboard device using evdev"""
-        devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
-        keyboards = []
-
-        for device in devices:
-            caps = device.capabilities()
-            if ecodes.EV_KEY in caps:
-                keys = caps[ecodes.EV_KEY]
-                # Check for function keys and letter keys
-                has_f_keys = any(k in keys for k in [ecodes.KEY_F1, ecodes.KEY_F9, ecodes.KEY_F10])
-                has_letters = ecodes.KEY_A in keys or ecodes.KEY_Q in keys
-                has_numbers = ecodes.KEY_1 in keys or ecodes.KEY_2 in keys
-
-                # Check if it has letter keys AND function keys or numbers (actual keyboard)
-                if has_letters and (has_f_keys or has_numbers):
-                    keyboards.append(device)
-
-        if not keyboards:
-            print("Warning: No keyboard device found!")
+    def is_config_file(self, path):
+        """Whether a file in configs/ is a hotkey config (not sample.yaml or calibration.yaml)"""
+        return path.suffix == '.yaml' and path.stem not in ('sample', 'calibration')
+
+    def load_calibration(self):
+        """Read the per-model settings written by --calibrate, if it has been run"""
+        calibration_file = self.configs_dir / 'calibration.yaml'
+        try:
+            with open(calibration_file) as f:
+                models = (yaml.safe_load(f) or {}).get('models') or {}
+        except FileNotFoundError:
+            models = {}
+        except (OSError, yaml.YAMLError, AttributeError) as e:
+            print("Error loading {}: {}".format(calibration_file, str(e)))
+            models = {}
+
+        self.model_speeds.calibrated = {
+            model: tuned['realtime_factor'] for model, tuned in models.items() if tuned.get('realtime_factor')
+        }
+        if models:
+            print("Using calibrated whisper.cpp settings for: " + ', '.join(sorted(models)))
+        return models
+
+    def load_config_file(self, config_file):
+        """Read one YAML config file and compile it"""
+        data = config_file.read_bytes()
+        loaded_config = yaml.safe_load(data) or {}
+        if not isinstance(loaded_config, dict):
+            raise ValueError("expected a mapping of settings")
+
+        # Merge with defaults
+        settings = {**DEFAULT_CONFIG, **loaded_config}
+        return CompiledConfig(
+            config_file.stem,
+            settings,
+            self.parse_hotkey(settings['hotkey']),
+            source=config_file,
+            digest=hashlib.sha256(data).hexdigest()
+        )
+
+    def default_configs(self):
+        """The single built-in config used when there are no config files"""
+        return {'default': CompiledConfig('default', DEFAULT_CONFIG, self.parse_hotkey(DEFAULT_CONFIG['hotkey']))}
+
+    def parse_hotkey(self, hotkey_str):
+        """Hotkeys only mean something to the daemon"""
+        return None
+
+    def notify(self, title, message):
+        """Tell the user about a failure (the message has already been printed)"""
+
+    def apply_rewrites(self, text, config):
+        """Fix misinterpreted words (dictionary) and expand spoken phrases (shortcuts)"""
+        return config['rewrite_rules'].apply(text)
+
+    def clean_newlines(self, text, config):
+        """Normalize newlines and spacing in the transcript"""
+        if config.get('avoid_newlines', False):
+            # Replace all newlines with spaces, then collapse multiple spaces
+            text = text.replace('\n', ' ').replace('\r', ' ')
+            text = re.sub(r' +', ' ', text)
+        else:
+            # Keep newlines only after sentence-ending punctuation (. ! ?)
+            # Replace other newlines with spaces
+            # First, normalize newlines
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+            # Replace newlines that don't follow sentence-ending punctuation with spaces
+            # Keep newlines that follow . ! ? (with optional quotes/brackets)
+            text = re.sub(r'(?<![.!?])\n', ' ', text)
+
+            # Clean up: strip spaces from each line and collapse multiple spaces
+            text = '\n'.join(line.strip() for line in text.split('\n'))
+            text = re.sub(r' +', ' ', text)
+
+        return text
+
+    def write_wav(self, path, frames, config):
+        """Write recorded PCM frames to a WAV file"""
+        wf = wave.open(path, 'wb')
+        wf.setnchannels(config['channels'])
+        wf.setsampwidth(2)  # 16-bit samples
+        wf.setframerate(config['sample_rate'])
+        # Write frame by frame instead of joining them into one big copy
+        for frame in frames:
+            wf.writeframesraw(frame)
+        wf.close()
+
+    def whisper_args(self, config, model_file, threads=None):
+        """Thread and processor flags for whisper.cpp: the config's own, else the calibrated ones
+
+        A thread count passed in (a share of the CPUs for one of several parallel
+        processes) replaces both, leaving one processor per process.
+        """
+        if threads:
+            return ['-t', str(threads)]
+        tuned = self.calibration.get(Path(model_file).stem[len('ggml-'):]) or {}
+        threads = config.get('whisper_threads') or tuned.get('threads')
+        processors = config.get('whisper_processors') or tuned.get('processors')
+        args = []
+        if threads:
+            args += ['-t', str(threads)]
+        if processors:
+            args += ['-p', str(processors)]
+        return args
+
+    def get_whisper_server(self, config, model_file=None):
+        """Get (creating if needed) the persistent whisper server for a config's model"""
+        model_file = model_file or config.model_file
+        if not config.server_path.exists():
+            raise RuntimeError("whisper-server binary not found at " + str(config.server_path))
+
+        extra_args = self.whisper_args(config, model_file)
+        with self.whisper_servers_lock:
+            key = self.whisper_server_key(config, model_file)
+            server = self.whisper_servers.get(key)
+            if server is None:
+                server = WhisperServer(
+                    config.server_path,
+                    model_file,
+                    config.get('whisper_server_startup_timeout', 60),
+                    extra_args
+                )
+                self.whisper_servers[key] = server
+            return server
+
+    def whisper_server_key(self, config, model_file):
+        """What makes two configs able to share a whisper-server: binary, model and arguments"""
+        return (str(config.server_path), str(model_file), tuple(self.whisper_args(config, model_file)))
+
+    def stop_unused_whisper_servers(self):
+        """Stop the servers no config would use any more, after configs or calibration changed
+
+        A server that's transcribing right now (for a recording started with the old
+        config) is left running and checked again after the next change.
+        """
+        used = set()
+        for config in self.configs.values():
+            if config.get('whisper_backend') != 'server':
+                continue
+            for model in [config['whisper_model']] + list(config.get('candidate_models') or []):
+                used.add(self.whisper_server_key(config, config.model_path(model)))
+
+        unused = []
+        with self.whisper_servers_lock:
+            for key, server in list(self.whisper_servers.items()):
+                if key not in used and server.lock.acquire(blocking=False):
+                    del self.whisper_servers[key]
+                    unused.append(server)
+        for server in unused:
+            try:
+                if server.is_running():
+                    print("Stopping whisper-server for '{}', no config uses it".format(server.model_file.name))
+                server.stop()
+            finally:
+                server.lock.release()
+
+    def warm_whisper_servers(self, configs=None):
+        """Load models for server-backed configs ahead of the first utterance"""
+        for config in (configs or list(self.configs.values())):
+            if config.get('whisper_backend') != 'server':
+                continue
+            if not config.has_model():
+                continue
+            try:
+                server = self.get_whisper_server(config)
+                with server.lock:
+                    server.ensure_running()
+            except Exception as e:
+                print("Could not start whisper-server for '{}': {}".format(config.name, str(e)))
+
+    def transcribe_range(self, capture, start, end, config, timings=None):
+        """Transcribe part of a recording, trimming silence first when VAD is enabled"""
+        views = capture.views(start, end)
+        bytes_per_second = config['sample_rate'] * config['channels'] * 2
+
+        if config.get('vad', False):
+            total = end - start
+            ranges = VoiceActivityDetector(config).speech_ranges(views)
+            kept = sum(range_end - range_start for range_start, range_end in ranges)
+
+            if not ranges:
+                print("VAD: no speech in {:.1f}s of audio, skipping transcription".format(
+                    total / bytes_per_second
+                ))
+                return None
+
+            print("VAD: kept {:.1f}s of {:.1f}s, removed {:.1f}s ({:.0f}%)".format(
+                kept / bytes_per_second,
+                total / bytes_per_second,
+                (total - kept) / bytes_per_second,
+                100.0 * (total - kept) / total
+            ))
+
+            views = []
+            for range_start, range_end in ranges:
+                views.extend(capture.views(start + range_start, start + range_end))
+
+        audio_seconds = sum(len(view) for view in views) / bytes_per_second
+        model = self.choose_model(config, audio_seconds)
+
+        # whisper-server handles one request at a time, splitting only helps whisper-cli
+        split = (self.split_recordings and config.get('whisper_backend') == 'cli'
+                 and config.get('parallel_split_seconds') and audio_seconds > config['parallel_split_seconds'])
+
+        whisper_start = time.monotonic()
+        if split:
+            text = self.transcribe_parallel(views, config, model)
+        else:
+            text = self.transcribe(views, config, model)
+        whisper_seconds = time.monotonic() - whisper_start
+
+        if audio_seconds and self.has_model(config, model):
+            self.metrics.observe_realtime_factor(model, whisper_seconds / audio_seconds)
+            if text is not None and not split and not self.whisper_run.cold:
+                # Parallel runs would make the model look faster than one process is, and
+                # failures, timeouts and server starts slower
+                self.model_speeds.observe(model, audio_seconds, whisper_seconds)
+
+        if timings is not None:
+            timings['model'] = model
+            # With streaming, the last segment's start is the one that follows stop_recording
+            timings['whisper_start'] = whisper_start
+            timings['whisper_seconds'] = timings.get('whisper_seconds', 0.0) + whisper_seconds
+            timings['whisper_audio_seconds'] = timings.get('whisper_audio_seconds', 0.0) + audio_seconds
+
+        return text
+
+    def choose_model(self, config, audio_seconds):
+        """Pick the most accurate candidate model expected to finish within the latency budget"""
+        budget = config.get('latency_budget')
+        candidates = [model for model in config.get('candidate_models') or [] if self.has_model(config, model)]
+        if not budget or not candidates:
+            return config['whisper_model']
+
+        model, estimates = self.model_speeds.choose(candidates, audio_seconds, budget)
+        print("Model '{}' for {:.1f}s of audio, budget {:.1f}s (expected {})".format(
+            model, audio_seconds, budget,
+            ', '.join('{} {:.1f}s'.format(name, seconds) for name, seconds in estimates)
+        ))
+        return model
+
+    def has_model(self, config, model=None):
+        """Whether a model can be used: downloaded, or left to the transcription service"""
+        return config.get('whisper_backend') == 'remote' or config.has_model(model)
+
+    def transcribe(self, frames, config, model=None):
+        """Transcribe recorded PCM frames using whisper.cpp with the specified config"""
+        model_file = config.model_path(model) if model else config.model_file
+        if not self.has_model(config, model):
+            error_msg = "Model file not found at " + str(model_file)
+            print("Warning: " + error_msg)
+            self.notify("Verbose Model Missing", error_msg)
             return None
 
-        # Sort keyboards - prefer ones with "keyboard" or "kbd" in the name, avoid "mouse" and "gaming"
-        def keyboard_priority(device):
-            name_lower = device.name.lower()
-            # Exclude devices with "mouse" in the name
-            if 'mouse' in name_lower or 'gaming' in name_lower:
-                return 999  # Low priority
-            # Prefer devices with "keyboard" or "kbd" in the name
-            if 'keyboard' in name_lower or 'kbd' in name_lower:
-                return 0  # High priority
-            return 100  # Medium priority
-
-        keyboards.sort(key=keyboard_priority)
-        print("Using keyboard: " + keyboards[0].name)
-        return keyboards[0]
+        try:
+            return self.run_whisper(frames, config, model_file)
+
+        except subprocess.TimeoutExpired:
+            error_msg = "Whisper transcription timed out after {}s. Your recording may be too long. Increase whisper_timeout in config.".format(config.get('whisper_timeout', 300))
+            print(error_msg)
+            self.notify("Verbose Transcription Timeout", error_msg)
+            return None
+        except Exception as e:
+            error_msg = "Transcription error: " + str(e)
+            print(error_msg)
+            self.notify("Verbose Transcription Failed", error_msg)
+            return None
+
+    def run_whisper(self, frames, config, model_file, threads=None):
+        """Run whisper on PCM frames with the config's backend, raising on failure"""
+        # WAV header followed by the recorded frames as-is, nothing gets joined or copied
+        frames = list(frames)
+        wav_chunks = [wav_header(sum(len(frame) for frame in frames), config['sample_rate'], config['channels'])]
+        wav_chunks.extend(frames)
+
+        text = None
+        self.whisper_run.cold = False
+
+        if config.get('whisper_backend') == 'remote':
+            model = Path(model_file).stem[len('ggml-'):]
+            client = TranscriptionClient(
+                config.get('remote_address') or DEFAULT_SERVICE_ADDRESS,
+                getpass.getuser(),
+                config.get('whisper_timeout', 300),
+                config.service_uids
+            )
+            try:
+                text = client.transcribe(frames, config['sample_rate'], config['channels'], model)
+            except socket.timeout:
+                raise subprocess.TimeoutExpired(client.address, config.get('whisper_timeout', 300))
+            except OSError as e:
+                # No (trusted) service running: transcribe here if the model is downloaded
+                if not config.has_model(model):
+                    raise RuntimeError("transcription service at {} unavailable: {}".format(client.address, str(e)))
+                print("Transcription service unavailable ({}), falling back to whisper-cli".format(str(e)))
+
+        elif config.get('whisper_backend') == 'server':
+            try:
+                server = self.get_whisper_server(config, model_file)
+                starts = server.starts
+                text = server.transcribe(wav_chunks, config.get('whisper_timeout', 300))
+                self.whisper_run.cold = server.starts != starts
+            except socket.timeout:
+                # Retrying with whisper-cli would only double the wait
+                raise subprocess.TimeoutExpired(str(config.whisper_path), config.get('whisper_timeout', 300))
+            except Exception as e:
+                # Fall back to the one-shot subprocess below, after time spent on the server
+                self.whisper_run.cold = True
+                print("whisper-server failed ({}), falling back to whisper-cli".format(str(e)))
+
+        if text is None and config.get('audio_handoff', 'file') == 'pipe':
+            try:
+                text = self.run_whisper_pipe(config.whisper_path, model_file, wav_chunks, config, threads)
+            except (OSError, RuntimeError) as e:
+                # Older whisper-cli builds can't read audio from stdin
+                print("Piping audio to whisper-cli failed ({}), using a temporary file".format(str(e)))
+
+        if text is None:
+            text = self.run_whisper_file(config.whisper_path, model_file, frames, config, threads)
+
+        if text:
+            # Remove [BLANK_AUDIO] markers (can appear at end of transcription)
+            text = text.strip().replace('[BLANK_AUDIO]', '').strip()
+
+            # Return text if not empty after filtering
+            if text:
+                return text
+
+        return None
+
+    def transcribe_parallel(self, views, config, model=None):
+        """Split a long recording at pauses and transcribe the pieces in parallel
+
+        Every piece runs in its own whisper-cli process with an equal share of the
+        CPUs. A piece that fails is retried on its own; if it still fails, the text
+        of the other pieces is kept and a notification says what's missing.
+        """
+        model_file = config.model_path(model) if model else config.model_file
+        if not config.has_model(model):
+            print("Warning: Model file not found at " + str(model_file))
+            return None
+
+        bytes_per_second = config['sample_rate'] * config['channels'] * 2
+        total = sum(len(view) for view in views)
+        cuts = VoiceActivityDetector(config).split_points(views, config['parallel_segment_seconds'])
+        pieces = list(zip([0] + cuts, cuts + [total]))
+
+        cpu_count = os.cpu_count() or 1
+        processes = min(len(pieces), cpu_count)
+        threads = max(1, cpu_count // processes)
+        if config.get('whisper_threads'):
+            threads = min(threads, config['whisper_threads'])
+        print("Splitting {:.0f}s of audio into {} pieces, {} whisper processes with {} threads each".format(
+            total / bytes_per_second, len(pieces), processes, threads
+        ))
+
+        def transcribe_piece(start, end):
+            attempts = 1 + max(0, config.get('segment_retries', 1))
+            for attempt in range(1, attempts + 1):
+                try:
+                    return self.run_whisper(slice_views(views, start, end), config, model_file, threads)
+                except Exception as e:
+                    print("Piece {:.0f}s-{:.0f}s failed (attempt {} of {}): {}".format(
+                        start / bytes_per_second, end / bytes_per_second, attempt, attempts, str(e)
+                    ))
+            raise RuntimeError("{:.0f}s-{:.0f}s".format(start / bytes_per_second, end / bytes_per_second))
+
+        texts = []
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=processes, thread_name_prefix='piece') as pool:
+            futures = [pool.submit(transcribe_piece, start, end) for start, end in pieces]
+            for future in futures:
+                try:
+                    texts.append(future.result())
+                except RuntimeError as e:
+                    failed.append(str(e))
+
+        if failed:
+            error_msg = "Could not transcribe {} of the recording".format(', '.join(failed))
+            print(error_msg)
+            self.notify("Verbose Transcription Failed", error_msg)
+
+        return ' '.join(text for text in texts if text) or None
+
+    def run_whisper_pipe(self, whisper_path, model_file, wav_chunks, config, threads=None):
+        """Run whisper-cli with the WAV streamed through stdin and the transcript read from stdout"""
+        read_fd, write_fd = os.pipe()
+        try:
+            process = subprocess.Popen(
+                [
+                    str(whisper_path),
+                    '-m', str(model_file),
+                    '--no-timestamps',
+                    '--no-prints',
+                    '-f', '-'
+                ] + self.whisper_args(config, model_file, threads),
+                stdin=read_fd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except Exception:
+            os.close(write_fd)
+            raise
+        finally:
+            os.close(read_fd)
+
+        # Feed stdin from a separate thread so a full stdout pipe can't deadlock us
+        writer = threading.Thread(target=write_pipe, args=(write_fd, wav_chunks), daemon=True)
+        writer.start()
+
+        try:
+            stdout, stderr = process.communicate(timeout=config.get('whisper_timeout', 300))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            writer.join()
+
+        if process.returncode != 0:
+            raise RuntimeError("whisper-cli exited with code {}: {}".format(
+                process.returncode, stderr.decode('utf-8', 'replace').strip()[-200:]
+            ))
+
+        return stdout.decode('utf-8', 'replace')
+
+    def run_whisper_file(self, whisper_path, model_file, frames, config, threads=None):
+        """Run whisper-cli on a temporary WAV file and read back its .txt output"""
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            wav_path = f.name
+
+        # Read output text file - whisper adds .txt to the input filename
+        # So /tmp/abc.wav becomes /tmp/abc.wav.txt
+        txt_file = Path(wav_path + '.txt')
+
+        try:
+            self.write_wav(wav_path, frames, config)
+
+            result = subprocess.run(
+                [
+                    str(whisper_path),
+                    '-m', str(model_file),
+                    '--output-txt',
+                    '-f', wav_path
+                ] + self.whisper_args(config, model_file, threads),
+                capture_output=True,
+                text=True,
+                timeout=config.get('whisper_timeout', 300)
+            )
+
+            if result.returncode != 0:
+                raise RuntimeError("whisper-cli exited with code {}: {}".format(
+                    result.returncode, result.stderr.strip()[-200:]
+                ))
+
+            if txt_file.exists():
+                return txt_file.read_text()
+            return None
+
+        finally:
+            # Clean up temp files
+            for path in (Path(wav_path), txt_file):
+                if path.exists():
+                    path.unlink()
+
+    def stop_whisper_servers(self):
+        for server in self.whisper_servers.values():
+            server.stop()
+
+
+class BatchTranscriber(Transcriber):
+    """Transcribe audio files headlessly, caching transcripts by audio content and settings"""
+
+    AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.ogg', '.opus', '.flac', '.webm', '.aac')
+    # Settings that can't change a transcript, so editing them keeps the cache
+    IGNORED_SETTINGS = (
+        'hotkey', 'insert_mode', 'paste_threshold', 'paste_keys', 'paste_restore_delay',
+        'typer', 'key_delay_ms', 'adaptive_key_delay',
+        'capture_memory_limit_mb', 'capture_prealloc_seconds', 'capture_spill_dir', 'native_capture',
+        'debug_keep_temp_files', 'whisper_timeout', 'whisper_server_startup_timeout',
+        'streaming', 'stream_pause_duration', 'stream_min_segment', 'stream_max_segment',
+        'auto_stop_silence', 'max_recording_seconds', 'rewrite_rules'
+    )
+    READ_SIZE = 1 << 20
+
+    def __init__(self, cache_dir=None):
+        super().__init__()
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.errors = threading.local()  # Failure reported while transcribing the current file
+
+    def notify(self, title, message):
+        self.errors.message = message
+
+    def find_files(self, paths):
+        """Audio files given directly or found under the given directories, in name order"""
+        files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files.extend(sorted(
+                    found for found in path.rglob('*')
+                    if found.suffix.lower() in self.AUDIO_EXTENSIONS and found.is_file()
+                ))
+            else:
+                files.append(path)
+        return files
+
+    def cache_key(self, path, config):
+        """Hash of the file contents and every setting that affects the transcript"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.READ_SIZE), b''):
+                digest.update(block)
+        settings = sorted((key, repr(value)) for key, value in config.items() if key not in self.IGNORED_SETTINGS)
+        digest.update(repr(settings).encode())
+        return digest.hexdigest()
+
+    def read_cache(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.cache_dir / key[:2] / (key + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_cache(self, key, entry):
+        if not self.cache_dir:
+            return
+        path = self.cache_dir / key[:2] / (key + '.json')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+            with open(temp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print("Could not cache transcript: " + str(e))
+
+    def load_audio(self, path, config, capture):
+        """Decode a file into the capture buffer as PCM in the config's format
+
+        16-bit WAV files are read directly (resampled and mixed down when they're in
+        another format), everything else is converted with ffmpeg.
+        """
+        try:
+            with wave.open(str(path), 'rb') as wf:
+                channels = wf.getnchannels()
+                if wf.getsampwidth() == 2 and wf.getcomptype() == 'NONE' and config['channels'] in (1, channels):
+                    resampler = None
+                    if (wf.getframerate(), channels) != (config['sample_rate'], config['channels']):
+                        resampler = Resampler(wf.getframerate(), channels, config['sample_rate'], config['channels'])
+                    frames_per_read = self.READ_SIZE // (2 * channels)
+                    for block in iter(lambda: wf.readframes(frames_per_read), b''):
+                        capture.write(resampler.process(block) if resampler else block)
+                    return
+        except (wave.Error, EOFError):
+            pass  # Not a plain PCM WAV file
+
+        try:
+            process = subprocess.Popen(
+                [
+                    'ffmpeg', '-nostdin', '-v', 'error', '-i', str(path),
+                    '-f', 's16le', '-ac', str(config['channels']), '-ar', str(config['sample_rate']), '-'
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            raise RuntimeError("ffmpeg is needed to read {} files".format(path.suffix or 'these'))
+
+        # Drain stderr separately so a chatty ffmpeg can't block on a full pipe
+        stderr = []
+        reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        reader.start()
+        for block in iter(lambda: process.stdout.read(self.READ_SIZE), b''):
+            capture.write(block)
+        process.wait()
+        reader.join()
+        if process.returncode != 0:
+            raise RuntimeError("ffmpeg exited with code {}: {}".format(
+                process.returncode, b''.join(stderr).decode('utf-8', 'replace').strip()[-200:]
+            ))
+
+    def transcribe_file(self, path, config):
+        """Transcript of one file as a JSON-ready record, from the cache when possible"""
+        start = time.monotonic()
+        record = {'file': str(path), 'config': config.name}
+        try:
+            key = self.cache_key(path, config)
+            cached = self.read_cache(key)
+            if cached is not None:
+                record.update(cached)
+                record.update(cached=True, seconds=round(time.monotonic() - start, 3))
+                return record
+
+            capture = CaptureBuffer(
+                int(config.get('capture_memory_limit_mb', 64) * (1 << 20)),
+                spill_dir=config.get('capture_spill_dir')
+            )
+            try:
+                self.load_audio(path, config, capture)
+                audio_seconds = len(capture) / (config['sample_rate'] * config['channels'] * 2)
+                self.errors.message = None
+                timings = {}
+                text = self.transcribe_range(capture, 0, len(capture), config, timings)
+            finally:
+                capture.close()
+
+            text = self.clean_newlines(self.apply_rewrites(text or '', config), config)
+            entry = {'text': text, 'model': timings.get('model', config['whisper_model']),
+                     'audio_seconds': round(audio_seconds, 3)}
+            record.update(entry)
+            record.update(cached=False, seconds=round(time.monotonic() - start, 3))
+            if self.errors.message:
+                # Keep whatever text there is, but try again next time
+                record['error'] = self.errors.message
+            else:
+                self.write_cache(key, entry)
+        except Exception as e:
+            record.update(error=str(e), seconds=round(time.monotonic() - start, 3))
+        return record
+
+
+class TranscriptionService(Transcriber):
+    """Shared transcription server: one warm whisper-server per model for every client
+
+    Clients (whisper_backend: remote) send a JSON header line, and the PCM it
+    announces once the service has a place for it in the queue; they get a JSON
+    line back. Requests wait in a bounded queue served round-robin across clients;
+    a full queue is answered with "busy" before any audio is sent, so clients back
+    off instead of piling up. Connections beyond what the queue and workers can
+    use wait to be accepted. {"stats": true} returns queue and latency statistics.
+    """
+
+    MAX_HEADER = 4096
+    MAX_AUDIO_SECONDS = 4 * 3600
+    IDLE_TIMEOUT = 60  # Seconds a connection may stay silent while it should be sending
+    SPARE_CONNECTIONS = 4  # Connections beyond queue and workers, for statistics
+
+    def __init__(self, config_name=None, max_queue=32, max_per_client=4, workers=1):
+        super().__init__()
+        config_name = config_name or sorted(self.configs)[0]
+        if config_name not in self.configs:
+            raise ValueError("Unknown config '{}', available: {}".format(config_name, ', '.join(sorted(self.configs))))
+        config = self.configs[config_name]
+        settings = dict(config.settings)
+        if settings['whisper_backend'] == 'remote':
+            raise ValueError("config '{}' sends its audio to a server itself".format(config_name))
+        if config.server_path.exists():
+            settings['whisper_backend'] = 'server'
+        else:
+            print("whisper-server not found at {}, every request starts whisper-cli".format(config.server_path))
+        self.config = CompiledConfig(config_name, settings, None)
+        self.formats = {}  # (sample_rate, channels) -> config for audio in that format
+
+        self.queue = FairQueue(max_queue, max_per_client)
+        self.workers = workers
+        self.errors = threading.local()  # Failure reported while transcribing the current request
+        self.stats_lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.busy_workers = 0
+        self.queue_seconds = RollingHistogram(Metrics.SECONDS_BUCKETS)
+        self.transcribe_seconds = RollingHistogram(Metrics.SECONDS_BUCKETS)
+
+    def notify(self, title, message):
+        self.errors.message = message
+
+    def format_config(self, sample_rate, channels):
+        """The served config for audio recorded with another sample rate or channel count"""
+        key = (sample_rate, channels)
+        if key not in self.formats:
+            if key == (self.config['sample_rate'], self.config['channels']):
+                self.formats[key] = self.config
+            else:
+                settings = dict(self.config.settings, sample_rate=sample_rate, channels=channels)
+                self.formats[key] = CompiledConfig(self.config.name, settings, None)
+        return self.formats[key]
+
+    def work(self):
+        """Worker thread: transcribe queued requests until the queue is closed"""
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            start = time.monotonic()
+            with self.stats_lock:
+                self.busy_workers += 1
+                self.queue_seconds.observe(start - request.queued_at)
+
+            self.errors.message = None
+            text = self.transcribe([request.audio], request.config, request.model)
+            whisper_seconds = time.monotonic() - start
+
+            with self.stats_lock:
+                self.busy_workers -= 1
+                self.transcribe_seconds.observe(whisper_seconds)
+                self.counts['failed' if self.errors.message else 'completed'] += 1
+            if self.errors.message:
+                request.reply = {'error': self.errors.message}
+            else:
+                request.reply = {
+                    'text': text or '',
+                    'model': request.model,
+                    'queue_seconds': round(start - request.queued_at, 3),
+                    'whisper_seconds': round(whisper_seconds, 3),
+                }
+            request.done.set()
+
+    def answer(self, header, reader, conn):
+        """Reply to one request; reads its audio from the connection once it has a place in the queue"""
+        if header.get('stats'):
+            return self.stats()
+
+        sample_rate = int(header.get('sample_rate', 16000))
+        channels = int(header.get('channels', 1))
+        size = int(header['bytes'])
+        if not 0 <= size <= self.MAX_AUDIO_SECONDS * sample_rate * channels * 2:
+            raise ValueError("bytes out of range")
+        config = self.format_config(sample_rate, channels)
+
+        model = header.get('model') or config['whisper_model']
+        if not config.has_model(model):
+            return {'error': "model '{}' isn't available on this server".format(model)}
+
+        client = str(header.get('client', 'anonymous'))
+        if not self.queue.reserve(client):
+            with self.stats_lock:
+                self.counts['rejected'] += 1
+            return {'error': 'busy', 'queued': self.queue.size}
+        try:
+            self.send(conn, {'ready': True})
+            audio = reader.read(size)
+            if len(audio) < size:
+                raise ValueError("connection closed after {} of {} bytes".format(len(audio), size))
+        except BaseException:
+            self.queue.release(client)
+            raise
+
+        request = types.SimpleNamespace(
+            audio=audio, config=config, model=model,
+            queued_at=time.monotonic(), done=threading.Event(), reply=None
+        )
+        self.queue.put(client, request)
+        request.done.wait()
+        return request.reply
+
+    @staticmethod
+    def send(conn, reply):
+        conn.sendall((json.dumps(reply) + '\n').encode('utf-8'))
+
+    def handle(self, conn, slots):
+        """Connection thread: answer requests until the client disconnects, then free its slot"""
+        try:
+            conn.settimeout(self.IDLE_TIMEOUT)
+            with conn, conn.makefile('rb') as reader:
+                while True:
+                    try:
+                        line = reader.readline(self.MAX_HEADER)
+                        if not line:
+                            return
+                        try:
+                            reply = self.answer(json.loads(line), reader, conn)
+                            keep_open = True
+                        except (ValueError, TypeError, KeyError, AttributeError) as e:
+                            # The rest of the stream can't be trusted to start with a header
+                            reply = {'error': 'bad request: ' + str(e)}
+                            keep_open = False
+                        self.send(conn, reply)
+                    except OSError:
+                        return
+                    if not keep_open:
+                        return
+        finally:
+            slots.release()
+
+    def stats(self):
+        """Queue depth per client, request counts and rolling queue/transcription times"""
+        with self.stats_lock:
+            return {
+                'queued': self.queue.size,
+                'queue_limit': self.queue.limit,
+                'clients': self.queue.depths(),
+                'workers': self.workers,
+                'busy_workers': self.busy_workers,
+                'completed': self.counts['completed'],
+                'failed': self.counts['failed'],
+                'rejected': self.counts['rejected'],
+                'models': sorted(Path(key[1]).stem[len('ggml-'):] for key in self.whisper_servers),
+                'queue_seconds': {
+                    'p{:.0f}'.format(fraction * 100): round(self.queue_seconds.quantile(fraction), 3)
+                    for fraction in Metrics.QUANTILES
+                },
+                'transcribe_seconds': {
+                    'p{:.0f}'.format(fraction * 100): round(self.transcribe_seconds.quantile(fraction), 3)
+                    for fraction in Metrics.QUANTILES
+                },
+            }
+
+    @staticmethod
+    def check_socket_directory(path):
+        """Refuse to listen where other users can create files, they could take the socket over"""
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            raise ValueError("{} doesn't exist, create it as root (e.g. RuntimeDirectory=verbose in a systemd unit)".format(directory))
+        info = os.stat(directory)
+        if info.st_mode & 0o022 or info.st_uid not in (0, os.getuid()):
+            raise ValueError("{} can be written by other users, they could replace the socket; use a directory only you or root can write".format(directory))
+
+    def serve(self, address):
+        """Accept clients on a Unix socket path or host:port (runs until interrupted)"""
+        family, bind_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            self.check_socket_directory(bind_address)
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.unlink(bind_address)
+        else:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(bind_address)
+        if family == socket.AF_UNIX:
+            # Shared by every user on the machine, that's what it's for (the directory isn't)
+            os.chmod(bind_address, 0o666)
+        listener.listen(16)
+
+        self.warm_whisper_servers([self.config])
+        for index in range(self.workers):
+            threading.Thread(target=self.work, name='serve-{}'.format(index), daemon=True).start()
+        print("Serving config '{}' on {} ({} worker(s), queue of {})".format(
+            self.config.name, address, self.workers, self.queue.limit
+        ))
+
+        # Every connection beyond these waits in the listen backlog, not in a thread
+        slots = threading.BoundedSemaphore(self.queue.limit + self.workers + self.SPARE_CONNECTIONS)
+        try:
+            while True:
+                slots.acquire()
+                try:
+                    conn, _ = listener.accept()
+                except BaseException:
+                    slots.release()
+                    raise
+                threading.Thread(target=self.handle, args=(conn, slots), daemon=True).start()
+        finally:
+            listener.close()
+            if family == socket.AF_UNIX and os.path.exists(bind_address):
+                os.unlink(bind_address)
+            self.queue.close()
+            self.stop_whisper_servers()
+
+
+class VerboseDaemon(Transcriber):
+    """Main daemon for voice-to-text recording and transcription"""
+
+    LEVEL_METER_INTERVAL_MS = 150
+    LEVEL_BARS = '\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'  # -60 dBFS to 0 dBFS
+
+    def __init__(self, metrics_textfile=None, metrics_socket=None, log_utterances=False, workers=2,
+                 headless=False, startup_target=0.5):
+        self.headless = headless  # No tray icon, notifications or GTK main loop
+        self.startup_target = startup_target  # Seconds to ready before a warning is printed
+        self.startup_phases = [('imports', time.monotonic() - STARTED)]
+        self.startup_mark = time.monotonic()
+
+        import_input_modules()
+        super().__init__()
+        self.startup_phase('configs')
+
+        self.is_recording = False
+        self.recording = None  # TranscriptionJob being recorded (id assigned when submitted)
+        self.audio = None  # PyAudio, created after startup (probing devices is slow)
+        self.audio_lock = threading.Lock()
+        self.stream = None  # Input stream opened for one recording
+        self.stream_resampler = None  # Converts its audio to the config's format, None if it's already in it
+        self.capture_lock = threading.Lock()  # Audio callbacks vs. starting and stopping recordings
+
+        # Always-open input stream (always_listening) and its pre-roll ring buffer
+        self.listen_stream = None
+        self.listen_format = None  # (sample_rate, channels) listen_stream delivers after conversion
+        self.listen_settings = None  # (sample_rate, channels, preroll_ms, native_capture) it was opened with
+        self.listen_resampler = None
+        self.preroll = None
+
+        # Levels of the latest recorded block, and how long the recording has been silent
+        self.level = (0.0, 0)  # (RMS, peak) of 16-bit samples, read by the tray's level meter
+        self.silent_bytes = 0
+        self.auto_stop_pending = False
+        self.typing_process = None  # Track ydotool process for cancellation
+        self.typer_sinks = {}  # Typer backend -> open sink, or None if it isn't available
+        self.typer_lock = threading.Lock()
+
+        # Per-utterance stage timings
+        self.metrics_textfile = metrics_textfile
+        self.metrics_socket = metrics_socket
+        self.log_utterances = log_utterances
+
+        # Job pipeline: recordings are transcribed on a worker pool and typed in order
+        self.workers = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transcribe')
+        self.jobs_lock = threading.Lock()
+        self.pending_jobs = {}  # job id -> TranscriptionJob, from submission until typed
+        self.finished_jobs = {}  # job id -> (job, text) waiting for earlier jobs to be typed
+        self.next_job_id = 1
+        self.next_job_to_type = 1
+        self.typing_queue = queue.Queue()
+        self.typer_thread = threading.Thread(target=self.typing_loop, daemon=True)
+        self.typer_thread.start()
+
+        # Callbacks for the main thread when there's no GLib main loop
+        self.main_queue = queue.Queue()
+        self.quitting = False
+
+        # Icon paths (relative to script directory)
+        script_dir = Path(__file__).parent
+        self.icon_dir = str(script_dir / "icons")
+        self.ICON_IDLE = str(script_dir / "icons" / "idle")
+        self.ICON_RECORDING = str(script_dir / "icons" / "recording")
+        self.ICON_PROCESSING = str(script_dir / "icons" / "processing")
+
+        self.indicator = None
+        if not headless:
+            import_tray_modules()
+
+            # System tray indicator - use icon theme path
+            self.indicator = AppIndicator3.Indicator.new(
+                "verbose",
+                "idle",  # Just the name, not full path
+                AppIndicator3.IndicatorCategory.APPLICATION_STATUS
+            )
+            self.indicator.set_icon_theme_path(self.icon_dir)
+            self.indicator.set_status(AppIndicator3.IndicatorStatus.ACTIVE)
+            self.indicator.set_menu(self.build_menu())
+            self.startup_phase('tray')
+
+        # Open every keyboard now, the monitor thread picks up ones plugged in later
+        self.keyboards = KeyboardMonitor(self.handle_key)
+        if not self.keyboards.scan():
+            print("Warning: No keyboard device found! Waiting for one to be plugged in")
+        self.startup_phase('keyboard')
+
+        # Build hotkey map: (modifier mask, key code) -> config_name
+        self.hotkey_map = self.build_hotkey_map(self.configs)
+
+        self.hotkey_thread = None
+
+    def startup_phase(self, name):
+        """Record how long a startup step took"""
+        now = time.monotonic()
+        self.startup_phases.append((name, now - self.startup_mark))
+        self.startup_mark = now
+
+    def report_startup(self):
+        """Print the time from process start to ready, step by step, against the target"""
+        total = time.monotonic() - STARTED
+        self.metrics.set_gauge('verbose_startup_seconds', total, 'Seconds from process start to ready')
+        print("Ready in {:.0f} ms ({})".format(
+            total * 1000, ', '.join('{} {:.0f}'.format(name, seconds * 1000) for name, seconds in self.startup_phases)
+        ))
+        if self.startup_target and total > self.startup_target:
+            print("Warning: startup took longer than the {:.0f} ms target".format(self.startup_target * 1000))
+
+    def get_audio(self):
+        """The PyAudio instance, created on first use without the ALSA/JACK probing noise"""
+        with self.audio_lock:
+            if self.audio is None:
+                import_audio_module()
+                with quiet_stderr():
+                    self.audio = pyaudio.PyAudio()
+            return self.audio
+
+    def idle_add(self, callback, *args):
+        """Run a callback on the main thread (GLib main loop, or ours in headless mode)"""
+        if self.headless:
+            self.main_queue.put((callback, args))
+        else:
+            GLib.idle_add(callback, *args)
+
+    def run_main_loop(self):
+        """Headless main loop: run callbacks queued by idle_add until quit"""
+        while not self.quitting:
+            try:
+                callback, args = self.main_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                print("Error in {}: {}".format(callback.__name__, str(e)))
+
+    def build_hotkey_map(self, configs):
+        """Map hotkey chords to config names, notifying about duplicates"""
+        hotkey_map = {}
+        for config_name, config in configs.items():
+            if config.hotkey_code in hotkey_map:
+                # Duplicate hotkey detected
+                message = "Duplicate hotkey '{}' in configs '{}' and '{}'. Skipping '{}'.".format(
+                    config['hotkey'],
+                    hotkey_map[config.hotkey_code],
+                    config_name,
+                    config_name
+                )
+                self.show_notification("Verbose Configuration Error", message)
+                print("Warning: " + message)
+            else:
+                hotkey_map[config.hotkey_code] = config_name
+        return hotkey_map
+
+    def reload_configs(self, names):
+        """Recompile the config files that changed and swap them in (config watcher thread)
+
+        Only the named files are read again. A file that fails to load keeps its previous
+        version, and recordings in progress hold on to the config they started with.
+        """
+        if 'calibration' in names:
+            self.calibration = self.load_calibration()
+            # Servers started with the old thread counts are replaced on first use
+            self.stop_unused_whisper_servers()
+
+        configs = {name: config for name, config in self.configs.items() if config.source is not None}
+        modified = False
+        reloaded = []
+
+        for config_name in sorted(names):
+            config_file = self.configs_dir / (config_name + '.yaml')
+            if not self.is_config_file(config_file):
+                continue
+
+            if not config_file.exists():
+                if configs.pop(config_name, None) is not None:
+                    print("Removed config '{}'".format(config_name))
+                    modified = True
+                continue
+
+            try:
+                config = self.load_config_file(config_file)
+            except Exception as e:
+                print("Error reloading {}: {}".format(config_file, str(e)))
+                self.show_notification(
+                    "Verbose Configuration Error",
+                    "Could not reload '{}': {}".format(config_name, str(e))
+                )
+                continue
+
+            previous = configs.get(config_name)
+            if previous is not None and previous.digest == config.digest:
+                continue
+            configs[config_name] = config
+            reloaded.append(config)
+            modified = True
+            print("{} config '{}' with hotkey '{}'".format(
+                'Reloaded' if previous is not None else 'Loaded', config_name, config['hotkey']
+            ))
+
+        if not modified:
+            return
+
+        if not configs:
+            print("No config files left in configs/, using defaults")
+            configs = self.default_configs()
+
+        # Configs first: a key press seen in between still finds its config (or is ignored)
+        hotkey_map = self.build_hotkey_map(configs)
+        self.configs = configs
+        self.hotkey_map = hotkey_map
+        self.idle_add(self.update_listening_stream)
+        self.stop_unused_whisper_servers()
+
+        if any(config.get('whisper_backend') == 'server' for config in reloaded):
+            threading.Thread(target=self.warm_whisper_servers, args=(reloaded,), daemon=True).start()
 
     def parse_hotkey(self, hotkey_str):
-        """Convert hotkey string like '<f9>' or '<alt>+<space>' to evdev key code"""
+        """Convert hotkey string like '<f9>' or '<alt>+<space>' to a (modifier mask, evdev key code) chord"""
         # Map common key names to evdev codes
         key_map = {
             'f1': ecodes.KEY_F1, 'f2': ecodes.KEY_F2, 'f3': ecodes.KEY_F3,
@@ -200,18 +3017,22 @@ class VerboseDaemon:
             'shift': ecodes.KEY_LEFTSHIFT, 'cmd': ecodes.KEY_LEFTMETA,
         }
 
-        # Parse simple format: <key> or <mod>+<key>
+        # Parse format: <key> or <mod>+<mod>+<key>
         parts = hotkey_str.replace('<', '').replace('>', '').lower().split('+')
 
-        if len(parts) == 1:
-            # Single key
-            key_name = parts[0]
-            return key_map.get(key_name, ecodes.KEY_F9)  # Default to F9
-        else:
-            # For now, just return the last key (the trigger key)
-            # TODO: Handle modifier keys properly
-            key_name = parts[-1]
-            return key_map.get(key_name, ecodes.KEY_F9)
+        mask = 0
+        for modifier in parts[:-1]:
+            if modifier not in KeyboardMonitor.MODIFIER_NAMES:
+                print("Warning: Unknown modifier '{}' in hotkey '{}'".format(modifier, hotkey_str))
+                continue
+            mask |= KeyboardMonitor.MODIFIER_NAMES[modifier]
+
+        key_name = parts[-1]
+        code = key_map.get(key_name, getattr(ecodes, 'KEY_' + key_name.upper(), None))
+        if code is None:
+            print("Warning: Unknown key '{}' in hotkey '{}', using F9".format(key_name, hotkey_str))
+            code = ecodes.KEY_F9  # Default to F9
+        return (mask, code)
 
     def build_menu(self):
         """Build system tray menu"""
@@ -224,8 +3045,17 @@ class VerboseDaemon:
         menu.show_all()
         return menu
 
+    def notify(self, title, message):
+        """Show a notification from any thread"""
+        self.show_notification(title, message)
+
     def show_notification(self, title, message):
-        """Show desktop notification using notify-send"""
+        """Show desktop notification using notify-send, without waiting for it"""
+        if self.headless:
+            return  # Messages are printed, there's no desktop to notify
+        threading.Thread(target=self.run_notify_send, args=(title, message), daemon=True).start()
+
+    def run_notify_send(self, title, message):
         try:
             subprocess.run(['notify-send', title, message], check=False)
         except Exception as e:
@@ -235,21 +3065,31 @@ class VerboseDaemon:
         """Toggle recording on/off using the specified config"""
         if self.is_recording:
             self.stop_recording()
-        else:
+        elif config_name in self.configs:  # Could have been removed by a reload since the key press
             self.start_recording(config_name)
 
     def cancel_operation(self):
-        """Cancel current operation (recording, processing, or typing)"""
-        self.is_cancelled = True
-
+        """Cancel current operation (recording, queued and running jobs, typing)"""
         # If currently recording, stop it
-        if self.is_recording:
+        with self.capture_lock:
             self.is_recording = False
-            if self.stream:
-                self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
-            self.audio_frames = []
+            job = self.recording
+            self.recording = None
+
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+        if job is not None:
+            self.cancel_job(job)
+            job.capture.close()
+
+        # Jobs still finish in the background but their results are dropped
+        with self.jobs_lock:
+            jobs = list(self.pending_jobs.values())
+        for job in jobs:
+            self.cancel_job(job)
 
         # If currently typing, kill the ydotool process
         if self.typing_process:
@@ -260,236 +3100,548 @@ class VerboseDaemon:
                 pass
             self.typing_process = None
 
-        # Return to idle state (processing will finish in background but result will be ignored)
-        self.is_processing = False
-        self.indicator.set_icon_full("idle", "")
+        # Return to idle state
+        self.update_indicator()
 
-    def start_recording(self, config_name):
-        """Start recording audio using the specified config"""
-        self.active_config_name = config_name
-        self.is_recording = True
-        self.is_cancelled = False  # Reset cancel flag when starting new recording
-        self.audio_frames = []
+    def cancel_job(self, job):
+        """Mark a job cancelled and stop transcribing its remaining segments"""
+        job.cancelled.set()
+        if job.streamer:
+            job.streamer.cancel()
 
-        # Update indicator to recording state (red)
-        self.indicator.set_icon_full("recording", "")
+    def update_indicator(self):
+        """Show recording, processing (with queue depth) or idle in the tray (main thread)"""
+        depth = self.queue_depth()
 
+        if self.indicator is None:
+            return
+
+        if self.is_recording:
+            self.indicator.set_icon_full("recording", "")
+        elif depth:
+            self.indicator.set_icon_full("processing", "")
+        else:
+            self.indicator.set_icon_full("idle", "")
+
+        # Show how many recordings are waiting when there is more than one
+        self.indicator.set_label(str(depth) if depth > 1 else "", "99")
+
+    def queue_depth(self):
+        """Recordings queued or being transcribed, not counting cancelled ones"""
+        with self.jobs_lock:
+            return sum(1 for job in self.pending_jobs.values() if not job.cancelled.is_set())
+
+    def start_recording(self, config_name):
+        """Start recording audio using the specified config"""
         # Get active config
         config = self.configs[config_name]
 
-        # Start audio stream
-        self.stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=config['channels'],
-            rate=config['sample_rate'],
-            input=True,
-            frames_per_buffer=1024,
-            stream_callback=self.audio_callback
+        timings = {
+            'config': config_name,
+            'model': config['whisper_model'],
+            'started': time.monotonic()
+        }
+
+        # A config the always-open stream doesn't fit gets its own stream, opened before the
+        # job is published: until self.stream is set, the always-open stream would write its
+        # own format into this recording
+        stream = None
+        if self.listen_format != (config['sample_rate'], config['channels']):
+            stream, resampler = self.open_input(config, self.audio_callback)
+
+        # Preallocated store the audio callback writes into
+        bytes_per_second = config['sample_rate'] * config['channels'] * 2
+        capture = CaptureBuffer(
+            int(config.get('capture_memory_limit_mb', 64) * (1 << 20)),
+            prealloc=int(config.get('capture_prealloc_seconds', 60) * bytes_per_second),
+            spill_dir=config.get('capture_spill_dir')
         )
-        self.stream.start_stream()
+
+        # Transcribe segments in the background while recording
+        streamer = None
+        if config.get('streaming', False):
+            streamer = StreamingTranscriber(config, capture, self.transcribe_range, timings)
+
+        job = TranscriptionJob(None, config_name, config, capture, streamer, timings, threading.Event())
+
+        with self.capture_lock:
+            self.level = (0.0, 0)
+            self.silent_bytes = 0
+            self.auto_stop_pending = False
+
+        if stream is None:
+            # The microphone is already open: start with the audio from just before the key press
+            with self.capture_lock:
+                if config.get('always_listening') and self.preroll is not None:
+                    preroll = self.preroll.snapshot()
+                    capture.write(preroll)
+                    if streamer:
+                        streamer.feed(preroll)
+                self.recording = job
+                self.is_recording = True
+            self.update_indicator()
+            self.start_level_meter(job)
+            return
+
+        with self.capture_lock:
+            self.stream, self.stream_resampler = stream, resampler
+            self.recording = job
+            self.is_recording = True
+
+        # Update indicator to recording state (red)
+        self.update_indicator()
+        self.start_level_meter(job)
+
+        # Start audio stream
+        stream.start_stream()
+
+    def input_format(self, config):
+        """Sample rate and channels to open the microphone with for a config
+
+        With native_capture, that's the default input device's own rate and up to two
+        of its channels, so neither PortAudio nor ALSA has to convert.
+        """
+        wanted = (config['sample_rate'], config['channels'])
+        if not config.get('native_capture', True):
+            return wanted
+        try:
+            info = self.get_audio().get_default_input_device_info()
+        except (IOError, OSError) as e:
+            print("Could not query the microphone ({}), recording at {} Hz".format(str(e), wanted[0]))
+            return wanted
+        # Only mono can be mixed down to, stereo configs record stereo
+        channels = config['channels'] if config['channels'] != 1 else max(1, min(int(info['maxInputChannels']), 2))
+        return int(info['defaultSampleRate']), channels
+
+    def open_input(self, config, callback):
+        """Open (not start) an input stream for a config, with the Resampler its callback needs or None"""
+        wanted = (config['sample_rate'], config['channels'])
+        rate, channels = self.input_format(config)
+
+        def open_stream(rate, channels):
+            return self.get_audio().open(
+                format=pyaudio.paInt16,
+                channels=channels,
+                rate=rate,
+                input=True,
+                frames_per_buffer=1024,
+                stream_callback=callback,
+                start=False
+            )
+
+        try:
+            stream = open_stream(rate, channels)
+        except Exception as e:
+            if (rate, channels) == wanted:
+                raise
+            print("Opening the microphone at {} Hz with {} channel(s) failed ({}), using {} Hz".format(
+                rate, channels, str(e), wanted[0]
+            ))
+            rate, channels = wanted
+            stream = open_stream(rate, channels)
+
+        if (rate, channels) == wanted:
+            return stream, None
+        print("Recording at {} Hz with {} channel(s), converting to {} Hz with {} channel(s)".format(
+            rate, channels, *wanted
+        ))
+        return stream, Resampler(rate, channels, *wanted)
 
     def audio_callback(self, in_data, frame_count, time_info, status):
         """Callback for audio stream"""
-        if self.is_recording:
-            self.audio_frames.append(in_data)
+        block = self.stream_resampler.process(in_data) if self.stream_resampler else in_data
+        levels = pcm_levels(block)
+        with self.capture_lock:
+            self.capture_block(block, levels)
+        return (in_data, pyaudio.paContinue)
+
+    def listen_callback(self, in_data, frame_count, time_info, status):
+        """Callback for the always-open stream: keep the pre-roll, record when a recording uses it"""
+        block = self.listen_resampler.process(in_data) if self.listen_resampler else in_data
+        # Levels only matter while recording, the stream is open the rest of the time too
+        levels = pcm_levels(block) if self.is_recording and self.stream is None else None
+        with self.capture_lock:
+            if self.preroll is not None:
+                self.preroll.write(block)
+            if self.stream is None:
+                self.capture_block(block, levels)
         return (in_data, pyaudio.paContinue)
 
+    def capture_block(self, in_data, levels=None):
+        """Add a block of audio to the recording in progress (capture_lock held)"""
+        job = self.recording
+        if self.is_recording and job is not None:
+            job.capture.write(in_data)
+            if job.streamer:
+                job.streamer.feed(in_data)
+            if levels is not None:
+                self.track_levels(job, len(in_data), levels)
+
+    def track_levels(self, job, size, levels):
+        """Update the level meter and stop the recording on silence or at its length limit (capture_lock held)"""
+        self.level = levels
+        config = job.config
+        if levels[0] < config.get('silence_threshold', 500):
+            self.silent_bytes += size
+        else:
+            self.silent_bytes = 0
+
+        if self.auto_stop_pending:
+            return
+        bytes_per_second = config['sample_rate'] * config['channels'] * 2
+        silence = config.get('auto_stop_silence', 0)
+        limit = config.get('max_recording_seconds', 0)
+        if silence and self.silent_bytes >= silence * bytes_per_second:
+            job.timings['auto_stop'] = 'silence'
+        elif limit and len(job.capture) >= limit * bytes_per_second:
+            job.timings['auto_stop'] = 'limit'
+        else:
+            return
+        # Streams can't be stopped from their own callback, and this runs once per recording
+        self.auto_stop_pending = True
+        self.idle_add(self.auto_stop, job)
+
+    def auto_stop(self, job):
+        """Stop a recording that went silent or reached max_recording_seconds (main thread)"""
+        if self.recording is not job:
+            return False  # Already stopped or cancelled
+        if job.timings['auto_stop'] == 'silence':
+            print("Stopping after {}s of silence".format(job.config['auto_stop_silence']))
+        else:
+            print("Stopping at the {}s recording limit".format(job.config['max_recording_seconds']))
+        self.stop_recording()
+        return False
+
+    def start_level_meter(self, job):
+        """Show the input level next to the tray icon a few times a second while recording"""
+        if self.indicator is None:
+            return
+        GLib.timeout_add(self.LEVEL_METER_INTERVAL_MS, self.update_level_meter, job)
+
+    def update_level_meter(self, job):
+        """GLib timeout: one bar for the latest RMS level, '!' when the input clips, then the queue depth
+
+        The red icon hides earlier recordings still being transcribed, so any depth is shown.
+        """
+        if self.recording is not job:
+            return False
+        rms, peak = self.level
+        decibels = 20 * math.log10(max(rms, 1.0) / 32768.0)
+        index = int((decibels + 60) / 60 * len(self.LEVEL_BARS))
+        bar = self.LEVEL_BARS[min(len(self.LEVEL_BARS) - 1, max(0, index))]
+        depth = self.queue_depth()
+        self.indicator.set_label(
+            bar + ('!' if peak >= 32767 else '') + (' {}'.format(depth) if depth else ''),
+            self.LEVEL_BARS[-1] + '! 99'
+        )
+        return True
+
+    def update_listening_stream(self):
+        """Open, reopen or release the always-open stream to match the configs (main thread)"""
+        listening = [config for config in self.configs.values() if config.get('always_listening')]
+        wanted = None
+        if listening:
+            config = listening[0]
+            wanted = (config['sample_rate'], config['channels'], config['preroll_ms'], config.get('native_capture', True))
+        if wanted == self.listen_settings:
+            return
+        if self.is_recording and self.stream is None:
+            return  # The recording in progress uses the stream, stop_recording comes back here
+
+        if self.listen_stream is not None:
+            self.listen_stream.stop_stream()
+            self.listen_stream.close()
+            with self.capture_lock:
+                self.listen_stream = None
+                self.listen_format = None
+                self.listen_settings = None
+                self.listen_resampler = None
+                self.preroll = None
+            print("Microphone released")
+
+        if wanted is None:
+            return
+
+        sample_rate, channels, preroll_ms, _ = wanted
+        frame_bytes = 2 * channels
+        preroll_bytes = int(preroll_ms / 1000.0 * sample_rate) * frame_bytes
+        with self.capture_lock:
+            self.preroll = PreRollBuffer(preroll_bytes, frame_bytes) if preroll_bytes else None
+        try:
+            self.listen_stream, self.listen_resampler = self.open_input(listening[0], self.listen_callback)
+            self.listen_stream.start_stream()
+        except Exception as e:
+            print("Could not keep the microphone open: " + str(e))
+            self.listen_stream = None
+            self.listen_resampler = None
+            self.preroll = None
+            return
+        self.listen_format = (sample_rate, channels)
+        self.listen_settings = wanted
+        print("Microphone open ({} Hz, {} channel(s)), keeping {} ms of pre-roll".format(
+            sample_rate, channels, preroll_ms
+        ))
+
+    def open_audio(self):
+        """Create PyAudio (and import numpy) in the background, then open the always-open stream if configured"""
+        import_numpy()
+        self.get_audio()
+        self.idle_add(self.update_listening_stream)
+
     def stop_recording(self):
-        """Stop recording and process audio"""
-        self.is_recording = False
+        """Stop recording and queue the audio for processing"""
+        with self.capture_lock:
+            self.is_recording = False
+            job = self.recording
+            self.recording = None
+            if job is not None:
+                job.timings['trailing_silence_bytes'] = self.silent_bytes
 
-        # Stop audio stream
+        # Stop audio stream (the always-open one keeps running)
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
             self.stream = None
 
-        # Process audio in background thread
-        if self.audio_frames:
-            # Update indicator to processing state (orange)
-            self.is_processing = True
-            self.indicator.set_icon_full("processing", "")
-            threading.Thread(target=self.process_audio, daemon=True).start()
-        else:
-            # No audio recorded, go back to idle
-            self.indicator.set_icon_full("idle", "")
+        # Config changes to always_listening wait for the recording to end
+        self.update_listening_stream()
 
-    def process_audio(self):
-        """Transcribe audio and insert text using the active config"""
-        # Check if cancelled before starting
-        if self.is_cancelled:
-            self.is_processing = False
+        if job is None:
+            self.update_indicator()
             return
 
-        # Get the active config
-        config = self.configs[self.active_config_name]
+        bytes_per_second = job.config['sample_rate'] * job.config['channels'] * 2
+        job.timings['stopped'] = time.monotonic()
+        job.timings['capture_seconds'] = len(job.capture) / bytes_per_second
 
-        # Save audio to temporary WAV file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            wav_path = f.name
+        # Process audio on the worker pool
+        if len(job.capture):
+            self.submit_job(job)
+        else:
+            # No audio recorded
+            self.cancel_job(job)
+            job.capture.close()
+
+        # Processing state (orange) while jobs are pending, otherwise idle
+        self.update_indicator()
+
+    def submit_job(self, job):
+        """Number a recorded job and hand it to the worker pool"""
+        with self.jobs_lock:
+            job = job._replace(id=self.next_job_id)
+            self.next_job_id += 1
+            self.pending_jobs[job.id] = job
+            depth = len(self.pending_jobs)
+
+        print("Recording #{} queued ({} in pipeline)".format(job.id, depth))
+        self.metrics.set_gauge('verbose_queue_depth', depth, 'Recordings waiting to be transcribed or typed')
+        self.workers.submit(self.process_job, job)
+
+    def process_job(self, job):
+        """Transcribe and post-process one job on a worker thread, then pass it to the typer"""
+        config = job.config
+        timings = job.timings
+        text = None
+        timings['outcome'] = 'cancelled'
 
         try:
-            wf = wave.open(wav_path, 'wb')
-            wf.setnchannels(config['channels'])
-            wf.setsampwidth(self.audio.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(config['sample_rate'])
-            wf.writeframes(b''.join(self.audio_frames))
-            wf.close()
-
-            # Check if cancelled before transcribing
-            if self.is_cancelled:
+            # Check if cancelled before starting
+            if job.cancelled.is_set():
                 return
 
-            # Transcribe with whisper.cpp
-            text = self.transcribe(wav_path, config)
+            if job.streamer:
+                # Earlier segments were transcribed while recording, only the last one is left
+                text = job.streamer.finish()
+            else:
+                end = len(job.capture)
+                if config.get('auto_stop_silence'):
+                    # Don't make whisper listen to the silence that ended the recording
+                    trailing = timings.get('trailing_silence_bytes', 0)
+                    if trailing >= end:
+                        print("No speech in the recording, skipping transcription")
+                        end = 0
+                    else:
+                        frame_bytes = 2 * config['channels']
+                        padding = int(config.get('vad_padding', 0.25) * config['sample_rate']) * frame_bytes
+                        end -= max(0, trailing - padding) // frame_bytes * frame_bytes
+                # Transcribe with whisper.cpp
+                if end:
+                    text = self.transcribe_range(job.capture, 0, end, config, timings)
+
+            if not text:
+                timings['outcome'] = 'empty'
 
             # Check if cancelled after transcription
-            if self.is_cancelled or not text:
-                # Keep temp file if debug mode is enabled and transcription failed
+            if job.cancelled.is_set() or not text:
+                # Keep the recording if debug mode is enabled and transcription failed
                 if config.get('debug_keep_temp_files', False) and not text:
-                    debug_path = '/tmp/verbose_debug_{}.wav'.format(os.path.basename(wav_path))
-                    import shutil
-                    shutil.copy(wav_path, debug_path)
+                    fd, debug_path = tempfile.mkstemp(prefix='verbose_debug_', suffix='.wav', dir='/tmp')
+                    os.close(fd)
+                    self.write_wav(debug_path, job.capture.views(), config)
                     msg = "Transcription failed. Audio saved to: " + debug_path
                     print(msg)
-                    GLib.idle_add(self.show_notification, "Verbose Debug", msg)
+                    self.notify("Verbose Debug", msg)
+                text = None
                 return
 
-            # Apply dictionary corrections (fix misinterpreted words)
-            text = self.apply_dictionary(text, config)
+            postprocess_start = time.monotonic()
 
-            # Apply shortcuts (expand spoken phrases)
-            text = self.apply_shortcuts(text, config)
+            # Apply dictionary corrections and shortcut expansions in one pass
+            text = self.apply_rewrites(text, config)
 
             # Clean up newlines and spacing
-            import re
-
-            if config.get('avoid_newlines', False):
-                # Replace all newlines with spaces, then collapse multiple spaces
-                text = text.replace('\n', ' ').replace('\r', ' ')
-                text = re.sub(r' +', ' ', text)
-            else:
-                # Keep newlines only after sentence-ending punctuation (. ! ?)
-                # Replace other newlines with spaces
-                # First, normalize newlines
-                text = text.replace('\r\n', '\n').replace('\r', '\n')
-
-                # Replace newlines that don't follow sentence-ending punctuation with spaces
-                # Keep newlines that follow . ! ? (with optional quotes/brackets)
-                text = re.sub(r'(?<![.!?])\n', ' ', text)
-
-                # Clean up: strip spaces from each line and collapse multiple spaces
-                text = '\n'.join(line.strip() for line in text.split('\n'))
-                text = re.sub(r' +', ' ', text)
+            text = self.clean_newlines(text, config)
 
-            # Check if cancelled before inserting text
-            if self.is_cancelled:
-                return
+            timings['postprocess_seconds'] = time.monotonic() - postprocess_start
 
-            # Insert text at cursor
-            self.insert_text(text)
+        except Exception as e:
+            print("Processing error: " + str(e))
+            timings['outcome'] = 'failed'
+            text = None
 
         finally:
-            # Clean up temp file
-            if os.path.exists(wav_path):
-                os.unlink(wav_path)
-
-            # Return to idle state (only if not already cancelled)
-            if not self.is_cancelled:
-                self.is_processing = False
-                GLib.idle_add(lambda: self.indicator.set_icon_full("idle", ""))
-
-    def transcribe(self, audio_file, config):
-        """Transcribe audio using whisper.cpp with the specified config"""
-        # Resolve paths relative to this script's location
-        script_dir = Path(__file__).parent.resolve()
-        whisper_path = Path(config['whisper_cpp_path'])
-
-        # If relative path, make it relative to script location
-        if not whisper_path.is_absolute():
-            whisper_path = (script_dir / whisper_path).resolve()
-        else:
-            whisper_path = whisper_path.expanduser()
-
-        model = config['whisper_model']
-
-        # Determine model path (go up to whisper.cpp root: build/bin/main -> build/bin -> build -> whisper.cpp)
-        model_dir = whisper_path.parent.parent.parent / 'models'
-        model_file = model_dir / ('ggml-' + model + '.bin')
+            job.capture.close()
+            self.deliver(job, text)
+
+    def deliver(self, job, text):
+        """Queue a processed job for typing once every earlier job has been typed"""
+        with self.jobs_lock:
+            self.finished_jobs[job.id] = (job, text)
+            while self.next_job_to_type in self.finished_jobs:
+                self.typing_queue.put(self.finished_jobs.pop(self.next_job_to_type))
+                self.next_job_to_type += 1
+
+    def typing_loop(self):
+        """Single typer thread, so text from back-to-back recordings is inserted in order"""
+        while True:
+            job, text = self.typing_queue.get()
 
-        if not model_file.exists():
-            print("Warning: Model file not found at " + str(model_file))
-            return None
-
-        try:
-            result = subprocess.run(
-                [
-                    str(whisper_path),
-                    '-m', str(model_file),
-                    '--output-txt',
-                    audio_file
-                ],
-                capture_output=True,
-                text=True,
-                timeout=config.get('whisper_timeout', 300)
-            )
-
-            # Read output text file - whisper adds .txt to the input filename
-            # So /tmp/abc.wav becomes /tmp/abc.wav.txt
-            txt_file = Path(audio_file + '.txt')
-
-            if txt_file.exists():
-                text = txt_file.read_text().strip()
-                txt_file.unlink()
-
-                # Remove [BLANK_AUDIO] markers (can appear at end of transcription)
-                text = text.replace('[BLANK_AUDIO]', '').strip()
-
-                # Return text if not empty after filtering
-                if text:
-                    return text
-
-            return None
-
-        except subprocess.TimeoutExpired:
-            error_msg = "Whisper transcription timed out after {}s. Your recording may be too long. Increase whisper_timeout in config.".format(config.get('whisper_timeout', 300))
-            print(error_msg)
-            GLib.idle_add(self.show_notification, "Verbose Transcription Timeout", error_msg)
-            return None
-        except Exception as e:
-            error_msg = "Transcription error: " + str(e)
-            print(error_msg)
-            GLib.idle_add(self.show_notification, "Verbose Transcription Failed", error_msg)
-            return None
+            # Check if cancelled before inserting text
+            if text and not job.cancelled.is_set():
+                # Insert text at cursor
+                typing_start = time.monotonic()
+                self.insert_text(text, job.config, job.cancelled)
+                job.timings['typing_seconds'] = time.monotonic() - typing_start
+                job.timings['characters'] = len(text)
+                job.timings['outcome'] = 'cancelled' if job.cancelled.is_set() else 'inserted'
+
+            self.finish_job(job)
+
+    def finish_job(self, job):
+        """Drop a typed (or abandoned) job from the pipeline and record its timings"""
+        with self.jobs_lock:
+            self.pending_jobs.pop(job.id, None)
+            depth = len(self.pending_jobs)
+
+        self.metrics.set_gauge('verbose_queue_depth', depth, 'Recordings waiting to be transcribed or typed')
+        self.record_utterance(job.timings)
+
+        # Return to idle state when nothing else is pending
+        self.idle_add(self.update_indicator)
+
+    def record_utterance(self, timings):
+        """Feed an utterance's stage timings into the metrics and optional exports"""
+        done = time.monotonic()
+        stopped = timings.get('stopped', done)
+        stages = {
+            'capture': timings.get('capture_seconds'),
+            'whisper': timings.get('whisper_seconds'),
+            'postprocess': timings.get('postprocess_seconds'),
+            'typing': timings.get('typing_seconds'),
+            'total': done - stopped
+        }
+        if timings.get('whisper_start', 0) >= stopped:
+            stages['stop_to_whisper'] = timings['whisper_start'] - stopped
 
-    def apply_dictionary(self, text, config):
-        """Apply word corrections from dictionary (fix misinterpreted words)"""
-        import re
-        for wrong, correct in config['dictionary'].items():
-            # Case-insensitive word replacement
-            # Use word boundaries to avoid partial matches
-            pattern = re.compile(r'\b' + re.escape(wrong) + r'\b', re.IGNORECASE)
-            text = pattern.sub(correct, text)
+        for stage, seconds in stages.items():
+            if seconds is not None:
+                self.metrics.observe_stage(stage, seconds)
+        self.metrics.count_utterance(timings.get('outcome', 'unknown'))
 
-        return text
+        if self.metrics_textfile:
+            try:
+                self.metrics.write_textfile(self.metrics_textfile)
+            except OSError as e:
+                print("Failed to write metrics: " + str(e))
+
+        if self.log_utterances:
+            record = {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'config': timings.get('config'),
+                'model': timings.get('model'),
+                'outcome': timings.get('outcome'),
+                'characters': timings.get('characters', 0)
+            }
+            for stage, seconds in stages.items():
+                if seconds is not None:
+                    record[stage + '_seconds'] = round(seconds, 4)
+            if timings.get('whisper_audio_seconds'):
+                record['realtime_factor'] = round(timings['whisper_seconds'] / timings['whisper_audio_seconds'], 4)
+            if timings.get('auto_stop'):
+                record['auto_stop'] = timings['auto_stop']
+            print(json.dumps(record))
+
+    def insert_text(self, text, config, cancelled=None):
+        """Insert text by typing or pasting, depending on the config's insert_mode"""
+        mode = config.get('insert_mode', 'type')
+        if mode == 'auto':
+            mode = 'paste' if len(text) >= config.get('paste_threshold', 200) else 'type'
+
+        if mode == 'paste' and self.paste_text(text, config, cancelled):
+            return
 
-    def apply_shortcuts(self, text, config):
-        """Apply phrase expansions from shortcuts"""
-        for phrase, replacement in config['shortcuts'].items():
-            # Case-insensitive phrase replacement
-            text = text.replace(phrase, replacement)
-            text = text.replace(phrase.lower(), replacement)
-            text = text.replace(phrase.capitalize(), replacement)
+        self.type_text(text, config, cancelled)
+
+    def get_typer_sink(self, backend):
+        """Open sink for an in-process typer backend, or None if it's unavailable (remembered)"""
+        with self.typer_lock:
+            if backend not in self.typer_sinks:
+                sink = None
+                try:
+                    if backend == 'uinput':
+                        sink = UInputSink()
+                    else:
+                        sink = YdotooldSink()
+                except (OSError, evdev.UInputError) as e:
+                    print("Typer '{}' unavailable: {}".format(backend, str(e)))
+                self.typer_sinks[backend] = sink
+            return self.typer_sinks[backend]
+
+    def get_keyboard_typer(self, config):
+        """In-process typer for a config, or None to run the ydotool command instead"""
+        backend = config.get('typer', 'auto')
+        backends = ('uinput', 'ydotoold') if backend == 'auto' else (backend,)
+        for backend in backends:
+            if backend == 'ydotool':
+                break
+            sink = self.get_typer_sink(backend)
+            if sink is not None:
+                return KeyboardTyper(
+                    sink, config.get('key_delay_ms', 5) / 1000, config.get('adaptive_key_delay', False)
+                )
+        return None
 
-        return text
+    def type_text(self, text, config=None, cancelled=None):
+        """Insert text as key presses (works with all applications including terminals)"""
+        typer = self.get_keyboard_typer(config) if config is not None else None
+        if typer is not None:
+            try:
+                typer.type(text, cancelled)
+                return
+            except OSError as e:
+                # Only what the typer didn't get to, the rest is already on screen
+                print("Typing failed ({}), typing the remaining {} characters with ydotool".format(
+                    str(e), len(typer.unsent)
+                ))
+                text = typer.unsent
+                if not text or (cancelled is not None and cancelled.is_set()):
+                    return
 
-    def insert_text(self, text):
-        """Insert text using ydotool (works with all applications including terminals)"""
+        key_delay = config.get('key_delay_ms', 5) if config is not None else 5
         try:
             # Use ydotool to type text (works at kernel level like evdev)
             # Store process so it can be killed if cancelled
-            # Use --key-delay 5 for faster typing (default is 12ms, 5ms is a good balance)
-            self.typing_process = subprocess.Popen(['ydotool', 'type', '--key-delay', '5', text])
+            self.typing_process = subprocess.Popen(['ydotool', 'type', '--key-delay', str(int(key_delay)), text])
             self.typing_process.wait()
             self.typing_process = None
 
@@ -500,27 +3652,83 @@ class VerboseDaemon:
             print("Text insertion error: " + str(e))
             self.typing_process = None
 
-    def listen_for_hotkey(self):
-        """Background thread to listen for hotkey presses using evdev"""
-        if not self.keyboard_device:
-            return
+    def clipboard_commands(self):
+        """Copy and read commands for the session clipboard (wl-clipboard on Wayland, xclip on X11)"""
+        if os.environ.get('WAYLAND_DISPLAY'):
+            return ['wl-copy'], ['wl-paste', '--no-newline']
+        return ['xclip', '-selection', 'clipboard'], ['xclip', '-selection', 'clipboard', '-o']
+
+    def paste_chord(self, keys):
+        """Key codes of a chord like 'ctrl+shift+v', in the order they're pressed"""
+        names = {'ctrl': 'LEFTCTRL', 'shift': 'LEFTSHIFT', 'alt': 'LEFTALT', 'cmd': 'LEFTMETA', 'super': 'LEFTMETA'}
+        codes = []
+        for part in keys.replace('<', '').replace('>', '').lower().split('+'):
+            code = getattr(ecodes, 'KEY_' + names.get(part, part.upper()), None)
+            if code is None:
+                raise ValueError("Unknown key '{}' in paste_keys".format(part))
+            codes.append(code)
+        return codes
+
+    def paste_text(self, text, config, cancelled=None):
+        """Insert text through the clipboard with a single paste chord, then restore the clipboard
+
+        Returns False if the clipboard can't be used, so the caller can type instead.
+        """
+        copy_command, read_command = self.clipboard_commands()
+
+        try:
+            chord = self.paste_chord(config.get('paste_keys', 'ctrl+v'))
+
+            # An empty or non-text clipboard makes the read command fail, restore nothing then
+            result = subprocess.run(read_command, capture_output=True, timeout=2)
+            previous = result.stdout if result.returncode == 0 else None
+
+            subprocess.run(copy_command, input=text.encode('utf-8'), check=True, timeout=2)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            print("Clipboard unavailable ({}), typing instead".format(str(e)))
+            return False
 
         try:
-            for event in self.keyboard_device.read_loop():
-                if event.type == ecodes.EV_KEY:
-                    key_event = evdev.categorize(event)
-                    # Only trigger on key press (not release)
-                    if key_event.keystate == evdev.KeyEvent.key_down:
-                        # Check if this key code matches any configured hotkey
-                        if event.code in self.hotkey_map:
-                            config_name = self.hotkey_map[event.code]
-                            # Use GLib to call toggle_recording in main thread
-                            GLib.idle_add(self.toggle_recording, config_name)
-                        elif event.code == ecodes.KEY_ESC:
-                            # Escape key cancels current operation
-                            GLib.idle_add(self.cancel_operation)
+            # ESC may have been pressed while the clipboard was being prepared
+            if cancelled is not None and cancelled.is_set():
+                return True
+
+            typer = self.get_keyboard_typer(config)
+            if typer is not None:
+                typer.chord(chord)
+            else:
+                # Store process so it can be killed if cancelled, like when typing
+                self.typing_process = subprocess.Popen(
+                    ['ydotool', 'key'] + ['{}:1'.format(code) for code in chord]
+                    + ['{}:0'.format(code) for code in reversed(chord)]
+                )
+                self.typing_process.wait()
+                self.typing_process = None
+
+            # The application reads the clipboard asynchronously after the chord
+            time.sleep(config.get('paste_restore_delay', 0.3))
+
         except Exception as e:
-            print("Hotkey listener error: " + str(e))
+            print("Paste error: " + str(e))
+            self.typing_process = None
+
+        finally:
+            if previous is not None:
+                try:
+                    subprocess.run(copy_command, input=previous, timeout=2)
+                except (OSError, subprocess.SubprocessError) as e:
+                    print("Failed to restore clipboard: " + str(e))
+
+        return True
+
+    def handle_key(self, mask, code):
+        """Hand a key press to the main thread if it's a hotkey or ESC (keyboard monitor thread)"""
+        config_name = self.hotkey_map.get((mask, code))
+        if config_name is not None:
+            self.idle_add(self.toggle_recording, config_name)
+        elif code == ecodes.KEY_ESC:
+            # Escape key cancels current operation, whatever modifiers are held
+            self.idle_add(self.cancel_operation)
 
     def run(self):
         """Start the daemon"""
@@ -529,12 +3737,30 @@ class VerboseDaemon:
             print("  - '{}': {}".format(config_name, config_data['hotkey']))
 
         # Start hotkey listener in background thread
-        self.hotkey_thread = threading.Thread(target=self.listen_for_hotkey, daemon=True)
+        self.hotkey_thread = threading.Thread(target=self.keyboards.run, daemon=True)
         self.hotkey_thread.start()
+        self.report_startup()
+
+        # Probe audio devices now so the first recording doesn't wait for it
+        threading.Thread(target=self.open_audio, daemon=True).start()
+
+        # Load models for server-backed configs so the first utterance doesn't wait for them
+        threading.Thread(target=self.warm_whisper_servers, daemon=True).start()
+
+        # Pick up edits to configs/ without restarting
+        watcher = ConfigWatcher(self.configs_dir, self.reload_configs)
+        threading.Thread(target=watcher.run, daemon=True).start()
+
+        if self.metrics_socket:
+            threading.Thread(target=self.metrics.serve, args=(self.metrics_socket,), daemon=True).start()
+            print("Serving metrics on " + self.metrics_socket)
 
         # Run GTK main loop
         try:
-            Gtk.main()
+            if self.headless:
+                self.run_main_loop()
+            else:
+                Gtk.main()
         except KeyboardInterrupt:
             self.quit()
 
@@ -542,21 +3768,228 @@ class VerboseDaemon:
         """Clean shutdown"""
         print("\nShutting down...")
 
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
+        for stream in (self.stream, self.listen_stream):
+            if stream:
+                stream.stop_stream()
+                stream.close()
+
+        if self.audio:
+            self.audio.terminate()
+
+        # Abandon queued jobs, in-flight transcriptions are cut off with the servers
+        self.workers.shutdown(wait=False, cancel_futures=True)
+
+        self.stop_whisper_servers()
+
+        for sink in self.typer_sinks.values():
+            if sink is not None:
+                sink.close()
+
+        self.keyboards.close()
+
+        self.quitting = True
+        if not self.headless:
+            Gtk.main_quit()
+
+
+def calibrate(args):
+    """Run the calibration sweep and write configs/calibration.yaml"""
+    settings = dict(DEFAULT_CONFIG)
+    if args.whisper_cpp_path:
+        settings['whisper_cpp_path'] = args.whisper_cpp_path
+    config = CompiledConfig('calibrate', settings, None)
+
+    if not config.whisper_path.exists():
+        print("whisper-cli not found at " + str(config.whisper_path))
+        return 1
+
+    calibrator = Calibrator(config.whisper_path, config.model_dir, args.calibrate_clip, max(1, args.calibrate_runs))
+    models = calibrator.models(args.calibrate_models)
+    if not models:
+        print("No models found in " + str(config.model_dir))
+        return 1
+    print("Calibrating {} model(s) on {} CPUs with {} settings each".format(
+        len(models), calibrator.cpu_count, len(calibrator.settings())
+    ))
+
+    calibration = calibrator.run(models)
+    if not calibration['models']:
+        print("Every whisper-cli run failed, nothing written")
+        return 1
+
+    print()
+    print("  model                  threads  processors  seconds  real-time factor")
+    for model, tuned in calibration['models'].items():
+        print("  {:<22} {:>7}  {:>10}  {:>7.2f}  {:>16.3f}".format(
+            model, tuned['threads'], tuned['processors'], tuned['seconds'], tuned['realtime_factor']
+        ))
+
+    configs_dir = Path(__file__).parent / 'configs'
+    configs_dir.mkdir(exist_ok=True)
+    calibrator.write(calibration, configs_dir / 'calibration.yaml')
+    print("\nWrote " + str(configs_dir / 'calibration.yaml'))
+    return 0
+
+
+def batch(args):
+    """Transcribe files headlessly, printing one JSON line per file as it finishes"""
+    output = open(args.output, 'a') if args.output else sys.stdout
+    # Everything else verbose prints goes to stderr so stdout stays valid JSON lines
+    sys.stdout = sys.stderr
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'verbose' / 'transcripts'
+    transcriber = BatchTranscriber(cache_dir)
+
+    config_name = args.config or sorted(transcriber.configs)[0]
+    if config_name not in transcriber.configs:
+        print("Unknown config '{}', available: {}".format(config_name, ', '.join(sorted(transcriber.configs))))
+        return 1
+    config = transcriber.configs[config_name]
+
+    files = transcriber.find_files(args.paths)
+    if not files:
+        print("No audio files found")
+        return 1
+    jobs = max(1, args.jobs or (os.cpu_count() or 1) // 4)
+    # Split files would each start up to one whisper-cli (and model copy) per CPU on top of
+    # the jobs, so only one file at a time gets split
+    transcriber.split_recordings = jobs == 1
+    print("Transcribing {} file(s) with config '{}', {} at a time".format(len(files), config_name, jobs))
+
+    start = time.monotonic()
+    audio_seconds = 0.0
+    counts = collections.Counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='batch') as pool:
+        futures = [pool.submit(transcriber.transcribe_file, path, config) for path in files]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                record = future.result()
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                output.flush()
+                audio_seconds += record.get('audio_seconds', 0.0)
+                counts['failed' if 'error' in record else 'cached' if record.get('cached') else 'transcribed'] += 1
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    wall_seconds = time.monotonic() - start
 
-        self.audio.terminate()
+    transcriber.stop_whisper_servers()
+    if output is not sys.__stdout__:
+        output.close()
 
-        if self.keyboard_device:
-            self.keyboard_device.close()
+    print("{} transcribed, {} cached, {} failed: {:.1f}s of audio in {:.1f}s ({:.1f} audio-seconds per second)".format(
+        counts['transcribed'], counts['cached'], counts['failed'],
+        audio_seconds, wall_seconds, audio_seconds / wall_seconds if wall_seconds else 0.0
+    ))
+    return 1 if counts['failed'] else 0
 
-        Gtk.main_quit()
+
+def serve(args):
+    """Run the shared transcription service, or print its statistics with --stats"""
+    if args.stats:
+        try:
+            stats = TranscriptionClient(args.address, None, 10).stats()
+        except OSError as e:
+            print("Can't reach the transcription service at {}: {}".format(args.address, str(e)))
+            return 1
+        print(json.dumps(stats, indent=2))
+        return 0
+
+    try:
+        service = TranscriptionService(args.config, args.max_queue, args.max_queue_per_client, args.workers)
+    except ValueError as e:
+        print(str(e))
+        return 1
+    try:
+        service.serve(args.address)
+    except ValueError as e:
+        print(str(e))
+        return 1
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    return 0
 
 
 def main():
     """Entry point"""
-    daemon = VerboseDaemon()
+    parser = argparse.ArgumentParser(description='Verbose - Simple voice-to-text daemon for Linux')
+    parser.add_argument('--metrics-textfile', metavar='PATH',
+                        help='Write Prometheus metrics to this file after every utterance')
+    parser.add_argument('--metrics-socket', metavar='PATH',
+                        help='Serve Prometheus metrics on this Unix socket')
+    parser.add_argument('--log-utterances', action='store_true',
+                        help='Print a JSON line with stage timings for every utterance')
+    parser.add_argument('--workers', type=int, default=2, metavar='N',
+                        help='Recordings transcribed in parallel (default: 2)')
+    parser.add_argument('--headless', action='store_true',
+                        help='Run without the tray icon and desktop notifications (servers, minimal sessions)')
+    parser.add_argument('--startup-target-ms', type=int, default=500, metavar='MS',
+                        help='Warn when startup takes longer than this (default: 500)')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='Find the fastest whisper.cpp thread/processor counts for every model, then exit')
+    parser.add_argument('--calibrate-models', nargs='+', metavar='MODEL',
+                        help='Only calibrate these models (default: every ggml-*.bin)')
+    parser.add_argument('--calibrate-clip', metavar='WAV',
+                        help='16 kHz mono WAV to calibrate with (default: 10s synthetic clip)')
+    parser.add_argument('--calibrate-runs', type=int, default=1, metavar='N',
+                        help='Runs per setting, the fastest counts (default: 1)')
+    parser.add_argument('--whisper-cpp-path', metavar='PATH',
+                        help='whisper-cli to calibrate (default: {})'.format(DEFAULT_CONFIG['whisper_cpp_path']))
+
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    batch_parser = subparsers.add_parser(
+        'batch', help='Transcribe audio files without the tray, keyboard or microphone',
+        description='Transcribe audio files with a config, one JSON line per file on stdout'
+    )
+    batch_parser.add_argument('paths', nargs='+', metavar='PATH',
+                              help='Audio files, or directories searched for them')
+    batch_parser.add_argument('--config', metavar='NAME',
+                              help='Config to use (default: the first by name)')
+    batch_parser.add_argument('--jobs', type=int, metavar='N',
+                              help='Files transcribed at the same time (default: CPUs / 4)')
+    batch_parser.add_argument('--output', metavar='PATH',
+                              help='Append the JSON lines to this file instead of stdout')
+    batch_parser.add_argument('--cache-dir', metavar='PATH',
+                              help='Transcript cache (default: ~/.cache/verbose/transcripts)')
+    batch_parser.add_argument('--no-cache', action='store_true',
+                              help='Transcribe every file again and cache nothing')
+    serve_parser = subparsers.add_parser(
+        'serve', help='Share warm whisper models with other Verbose instances (whisper_backend: remote)',
+        description='Transcribe audio for every Verbose instance on this machine with one warm model per name'
+    )
+    serve_parser.add_argument('--address', default=DEFAULT_SERVICE_ADDRESS, metavar='PATH|HOST:PORT',
+                              help='Unix socket path or TCP host:port (default: {})'.format(DEFAULT_SERVICE_ADDRESS))
+    serve_parser.add_argument('--config', metavar='NAME',
+                              help='Config with the whisper.cpp settings to serve (default: the first by name)')
+    serve_parser.add_argument('--workers', type=int, default=1, metavar='N',
+                              help='Requests transcribed at the same time (default: 1)')
+    serve_parser.add_argument('--max-queue', type=int, default=32, metavar='N',
+                              help='Requests that may wait, more are answered busy (default: 32)')
+    serve_parser.add_argument('--max-queue-per-client', type=int, default=4, metavar='N',
+                              help='Requests one client may have waiting (default: 4)')
+    serve_parser.add_argument('--stats', action='store_true',
+                              help='Print the running service\'s queue and latency statistics and exit')
+    args = parser.parse_args()
+
+    if args.command == 'batch':
+        sys.exit(batch(args))
+
+    if args.command == 'serve':
+        sys.exit(serve(args))
+
+    if args.calibrate:
+        sys.exit(calibrate(args))
+
+    daemon = VerboseDaemon(
+        metrics_textfile=args.metrics_textfile,
+        metrics_socket=args.metrics_socket,
+        log_utterances=args.log_utterances,
+        workers=max(1, args.workers),
+        headless=args.headless,
+        startup_target=args.startup_target_ms / 1000.0
+    )
 
     # Handle Ctrl+C gracefully
     signal.signal(signal.SIGINT, lambda s, f: daemon.quit())